@@ -0,0 +1,90 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+from Db.database import DynamoDB
+
+
+class CachedDynamoDB(DynamoDB):
+    """
+    DynamoDB table with an in-process, size-bounded LRU cache in front of
+    get_item and scan_items.
+
+    Entries expire after `ttl` seconds, and any write through this instance
+    (save_item, delete_item, batch writes) drops the whole table's cache, so
+    a process always sees its own writes. Other processes' writes become
+    visible after at most `ttl` seconds.
+    """
+
+    def __init__(self, table_name: str, ttl: float = 60, max_entries: int = 256):
+        super().__init__(table_name)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._generation = 0
+
+    def _cached(self, key: tuple, loader):
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+        # Failed reads come back as None; don't pin them in the cache
+        if value is None or self.ttl <= 0:
+            return value
+
+        with self._cache_lock:
+            # A write landed while we were loading; the value may already be stale
+            if generation != self._generation:
+                return value
+            self._cache[key] = (now + self.ttl, copy.deepcopy(value))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def _on_write(self):
+        self.invalidate()
+
+    def get_item(self, key: Dict[str, Any]):
+        cache_key = ('get',) + tuple(sorted(key.items()))
+        return self._cached(cache_key, lambda: super(CachedDynamoDB, self).get_item(key))
+
+    def scan_items(self, attributes=None, total_segments: int = 1):
+        cache_key = ('scan', tuple(attributes or ()))
+        return self._cached(cache_key, lambda: super(CachedDynamoDB, self).scan_items(attributes, total_segments))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            size = len(self._cache)
+        lookups = self.hits + self.misses
+        return {
+            "table": self.table_name,
+            "ttl_seconds": self.ttl,
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -1,31 +1,214 @@
 import boto3
 import os
-from typing import Dict, Any, List, Optional
+import json
+import base64
+import time
+import random
+import threading
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
+import instrumentation
+
+def encode_cursor(key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Opaque, URL-safe pagination cursor for a LastEvaluatedKey."""
+    if not key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(key, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+# BatchWriteItem accepts at most 25 put/delete requests per call,
+# BatchGetItem at most 100 keys
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = 100
+
+
+class BatchWriter:
+    """
+    Buffers puts/deletes and sends them with BatchWriteItem in 25-request chunks.
+    Unprocessed items are retried with jittered exponential backoff.
+    Safe to share between threads; use as a context manager so the
+    remaining buffer is flushed on exit. Requests given up on are kept in
+    `unprocessed`.
+    """
+
+    def __init__(self, db: "DynamoDB", max_retries: int = 5, base_delay: float = 0.05):
+        self.db = db
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.written = 0
+        self.failed = 0
+        self.unprocessed: List[Dict[str, Any]] = []
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def put(self, item: Dict[str, Any]):
+        self._add({'PutRequest': {'Item': item}})
+
+    def delete(self, key: Dict[str, Any]):
+        self._add({'DeleteRequest': {'Key': key}})
+
+    def _add(self, request: Dict[str, Any]):
+        with self._lock:
+            self._buffer.append(request)
+            if len(self._buffer) < BATCH_WRITE_LIMIT:
+                return
+            chunk = self._buffer[:BATCH_WRITE_LIMIT]
+            self._buffer = self._buffer[BATCH_WRITE_LIMIT:]
+        self._write_chunk(chunk)
+
+    def flush(self):
+        with self._lock:
+            pending = self._buffer
+            self._buffer = []
+        for start in range(0, len(pending), BATCH_WRITE_LIMIT):
+            self._write_chunk(pending[start:start + BATCH_WRITE_LIMIT])
+
+    def _write_chunk(self, requests: List[Dict[str, Any]]):
+        client = self.db.client
+        attempt = 0
+        while requests:
+            try:
+                response = client.batch_write_item(RequestItems={self.db.table_name: requests})
+            except ClientError as e:
+                print(f"Error batch writing to {self.db.table_name}: {e}")
+                response = {'UnprocessedItems': {self.db.table_name: requests}}
+
+            unprocessed = response.get('UnprocessedItems', {}).get(self.db.table_name, [])
+            with self._lock:
+                self.written += len(requests) - len(unprocessed)
+            if len(unprocessed) < len(requests):
+                self.db._on_write()
+            requests = unprocessed
+            if not requests:
+                break
+            if attempt >= self.max_retries:
+                print(f"Giving up on {len(requests)} unprocessed items for {self.db.table_name}")
+                with self._lock:
+                    self.failed += len(requests)
+                    self.unprocessed.extend(requests)
+                break
+            time.sleep(self.base_delay * (2 ** attempt) * (0.5 + random.random()))
+            attempt += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def shared_client():
+    """
+    The process-wide DynamoDB client, built once from its own session.
+
+    boto3 sessions and resources are not thread-safe, but clients are, so
+    every table and worker thread shares this one client (and its
+    connection pool). It is the client of a DynamoDB resource, so it still
+    takes and returns plain Python values (str, Decimal, ...) rather than
+    the low-level {'S': ...} wire format.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                session = boto3.session.Session(
+                    region_name=os.getenv("AWS_REGION", "us-east-1"),
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+                )
+                # e.g. DynamoDB Local for development and benchmarks
+                resource = session.resource('dynamodb', endpoint_url=os.getenv("DYNAMODB_ENDPOINT_URL") or None)
+                instrumentation.instrument_dynamodb(resource.meta.client)
+                _client = resource.meta.client
+    return _client
+
 
 class DynamoDB:
     def __init__(self, table_name: str):
         """
         Initialize DynamoDB connection.
         """
-        self.dynamodb = boto3.resource(
-            'dynamodb',
-            region_name=os.getenv("AWS_REGION", "us-east-1"),
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-        )
         self.table_name = table_name
-        self.table = self.dynamodb.Table(table_name)
 
-    def create_table(self, pk: str, sk: str = None, sk_type: str = 'S'):
+    @property
+    def client(self):
+        return shared_client()
+
+    def _on_write(self):
+        """Hook fired after every successful write; caching subclasses invalidate here."""
+        pass
+
+    @staticmethod
+    def _index_spec(index: Dict[str, Any]) -> Dict[str, Any]:
+        key_schema = [{'AttributeName': index['pk'], 'KeyType': 'HASH'}]
+        if index.get('sk'):
+            key_schema.append({'AttributeName': index['sk'], 'KeyType': 'RANGE'})
+        projection = {'ProjectionType': 'KEYS_ONLY'}
+        if index.get('attributes'):
+            projection = {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': index['attributes']}
+        return {
+            'IndexName': index['name'],
+            'KeySchema': key_schema,
+            'Projection': projection,
+            'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+        }
+
+    @staticmethod
+    def _index_attributes(index: Dict[str, Any]) -> List[Dict[str, str]]:
+        return [{'AttributeName': index[key], 'AttributeType': 'S'} for key in ('pk', 'sk') if index.get(key)]
+
+    def _add_missing_indexes(self, indexes: List[Dict[str, Any]]):
+        """Add global secondary indexes an existing table does not have yet (they backfill asynchronously)."""
+        client = self.client
+        existing = {
+            index['IndexName']
+            for index in client.describe_table(TableName=self.table_name)['Table'].get('GlobalSecondaryIndexes', [])
+        }
+        for index in indexes:
+            if index['name'] in existing:
+                continue
+            print(f"Adding index {index['name']} to {self.table_name}...")
+            client.update_table(
+                TableName=self.table_name,
+                AttributeDefinitions=self._index_attributes(index),
+                GlobalSecondaryIndexUpdates=[{'Create': self._index_spec(index)}]
+            )
+
+    def create_table(self, pk: str, sk: str = None, sk_type: str = 'S',
+                     indexes: Optional[List[Dict[str, Any]]] = None):
         """
-        Creates the table if it doesn't exist.
+        Creates the table if it doesn't exist. `indexes` are global secondary
+        indexes with string keys, as {'name', 'pk', 'sk', 'attributes'}
+        (`sk` and the projected non-key `attributes` optional); they are also
+        added to an existing table that lacks them.
         """
         try:
             # Check if table exists
-            existing_tables = [t.name for t in self.dynamodb.tables.all()]
+            existing_tables = [
+                name for page in self.client.get_paginator('list_tables').paginate()
+                for name in page['TableNames']
+            ]
             if self.table_name in existing_tables:
                 print(f"Table {self.table_name} already exists.")
+                if indexes:
+                    self._add_missing_indexes(indexes)
                 return True
 
             print(f"Creating table {self.table_name}...")
@@ -37,71 +220,280 @@ class DynamoDB:
                 key_schema.append({'AttributeName': sk, 'KeyType': 'RANGE'})
                 attribute_definitions.append({'AttributeName': sk, 'AttributeType': sk_type})
 
-            table = self.dynamodb.create_table(
+            extra = {}
+            if indexes:
+                for index in indexes:
+                    attribute_definitions += [
+                        definition for definition in self._index_attributes(index)
+                        if definition['AttributeName'] not in {d['AttributeName'] for d in attribute_definitions}
+                    ]
+                extra['GlobalSecondaryIndexes'] = [self._index_spec(index) for index in indexes]
+
+            self.client.create_table(
                 TableName=self.table_name,
                 KeySchema=key_schema,
                 AttributeDefinitions=attribute_definitions,
-                ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+                ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5},
+                **extra
             )
             
             # Wait for table to be created
-            table.meta.client.get_waiter('table_exists').wait(TableName=self.table_name)
-            self.table = self.dynamodb.Table(self.table_name)
+            self.client.get_waiter('table_exists').wait(TableName=self.table_name)
             print(f"Table {self.table_name} created successfully.")
             return True
         except ClientError as e:
             print(f"Error creating table {self.table_name}: {e}")
             return False
 
-    def save_item(self, item: Dict[str, Any]):
+    def save_item(self, item: Dict[str, Any], condition_expression: Optional[str] = None,
+                  expression_attribute_values: Optional[Dict[str, Any]] = None,
+                  expression_attribute_names: Optional[Dict[str, str]] = None):
         """
-        Generic save item method.
+        Generic save item method. With `condition_expression` the item is
+        only written if the condition holds; returns False otherwise.
         """
+        kwargs = {'Item': item}
+        if condition_expression:
+            kwargs['ConditionExpression'] = condition_expression
+        if expression_attribute_values:
+            kwargs['ExpressionAttributeValues'] = expression_attribute_values
+        if expression_attribute_names:
+            kwargs['ExpressionAttributeNames'] = expression_attribute_names
         try:
-            self.table.put_item(Item=item)
+            self.client.put_item(TableName=self.table_name, **kwargs)
+            self._on_write()
             return True
         except ClientError as e:
-            print(f"Error saving item to {self.table_name}: {e}")
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                print(f"Error saving item to {self.table_name}: {e}")
             return False
 
+    def batch_writer(self) -> BatchWriter:
+        """
+        Buffered bulk writer, e.g.:
+            with metrics_db.batch_writer() as writer:
+                writer.put(item)
+        """
+        return BatchWriter(self)
+
+    def save_items(self, items: List[Dict[str, Any]]):
+        """
+        Bulk save method. Returns True if every item was written.
+        """
+        with self.batch_writer() as writer:
+            for item in items:
+                writer.put(item)
+        return writer.failed == 0
+
     def get_item(self, key: Dict[str, Any]):
         """
         Generic get item method.
         """
         try:
-            response = self.table.get_item(Key=key)
+            response = self.client.get_item(TableName=self.table_name, Key=key)
             return response.get('Item')
         except ClientError as e:
             print(f"Error getting item from {self.table_name}: {e}")
             return None
 
-    def scan_items(self):
+    def _paginate(self, operation: str, kwargs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield items from a scan/query, requesting the next page only once the
+        previous one has been consumed.
+        """
+        kwargs = dict(kwargs)
+        while True:
+            try:
+                response = getattr(self.client, operation)(TableName=self.table_name, **kwargs)
+            except ClientError as e:
+                print(f"Error during {operation} on {self.table_name}: {e}")
+                return
+            for item in response.get('Items', []):
+                yield item
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return
+            kwargs['ExclusiveStartKey'] = last_key
+
+    @staticmethod
+    def _projection(kwargs: Dict[str, Any], attributes: Optional[List[str]]):
+        # Placeholders avoid clashes with reserved words such as `timestamp`
+        if attributes:
+            names = {f"#p{i}": name for i, name in enumerate(attributes)}
+            kwargs['ProjectionExpression'] = ", ".join(names)
+            kwargs.setdefault('ExpressionAttributeNames', {}).update(names)
+
+    def iter_scan(self, attributes: Optional[List[str]] = None, page_size: Optional[int] = None,
+                  segment: Optional[int] = None, total_segments: Optional[int] = None,
+                  **kwargs) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily scan the whole table (or one segment of a parallel scan).
+        `attributes` limits the returned fields, `page_size` the items per request.
+        Extra kwargs (e.g. FilterExpression) go straight to the Scan call.
+        """
+        self._projection(kwargs, attributes)
+        if page_size:
+            kwargs['Limit'] = page_size
+        if total_segments:
+            kwargs['Segment'] = segment
+            kwargs['TotalSegments'] = total_segments
+        return self._paginate('scan', kwargs)
+
+    def iter_query(self, key_condition_expression, expression_attribute_values,
+                   attributes: Optional[List[str]] = None, page_size: Optional[int] = None,
+                   scan_forward: bool = True, **kwargs) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily query a partition, following LastEvaluatedKey across pages.
+        Extra kwargs (e.g. ExpressionAttributeNames) go straight to the Query call.
+        """
+        kwargs['KeyConditionExpression'] = key_condition_expression
+        kwargs['ExpressionAttributeValues'] = expression_attribute_values
+        kwargs['ScanIndexForward'] = scan_forward
+        self._projection(kwargs, attributes)
+        if page_size:
+            kwargs['Limit'] = page_size
+        return self._paginate('query', kwargs)
+
+    def query_page(self, key_condition_expression, expression_attribute_values, limit: int,
+                   exclusive_start_key: Optional[Dict[str, Any]] = None,
+                   attributes: Optional[List[str]] = None, scan_forward: bool = True,
+                   **kwargs) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Read one client-facing page of at most `limit` items.
+        Returns (items, last_evaluated_key); the key is None on the last page.
+        """
+        kwargs['KeyConditionExpression'] = key_condition_expression
+        kwargs['ExpressionAttributeValues'] = expression_attribute_values
+        kwargs['ScanIndexForward'] = scan_forward
+        self._projection(kwargs, attributes)
+        if exclusive_start_key:
+            kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+        items = []
+        last_key = None
+        while len(items) < limit:
+            kwargs['Limit'] = limit - len(items)
+            try:
+                response = self.client.query(TableName=self.table_name, **kwargs)
+            except ClientError as e:
+                print(f"Error querying {self.table_name}: {e}")
+                return items, None
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            kwargs['ExclusiveStartKey'] = last_key
+        return items, last_key
+
+    def scan_page(self, limit: int, exclusive_start_key: Optional[Dict[str, Any]] = None,
+                  attributes: Optional[List[str]] = None,
+                  **kwargs) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Read a single scan request of up to `limit` evaluated items.
+        Returns (items, last_evaluated_key); the key is None once the scan is done.
+        Raises ClientError so callers such as resumable tools can stop cleanly.
+        """
+        kwargs['Limit'] = limit
+        self._projection(kwargs, attributes)
+        if exclusive_start_key:
+            kwargs['ExclusiveStartKey'] = exclusive_start_key
+        response = self.client.scan(TableName=self.table_name, **kwargs)
+        return response.get('Items', []), response.get('LastEvaluatedKey')
+
+    def parallel_scan(self, total_segments: int = 4, attributes: Optional[List[str]] = None,
+                      page_size: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Generic scan method.
+        Scan the table as `total_segments` segments on separate threads.
         """
+        def scan_segment(segment):
+            return list(self.iter_scan(attributes, page_size, segment, total_segments))
+
+        with ThreadPoolExecutor(max_workers=total_segments) as pool:
+            pages = pool.map(scan_segment, range(total_segments))
+        return [item for page in pages for item in page]
+
+    def batch_get_items(self, keys: List[Dict[str, Any]], attributes: Optional[List[str]] = None,
+                        max_retries: int = 5, base_delay: float = 0.05) -> List[Dict[str, Any]]:
+        """
+        Fetch many items by key with BatchGetItem (100 keys per call),
+        retrying unprocessed keys with backoff. Missing items are skipped;
+        result order is not guaranteed.
+        """
+        unique_keys = []
+        seen = set()
+        for key in keys:
+            marker = tuple(sorted(key.items()))
+            if marker not in seen:
+                seen.add(marker)
+                unique_keys.append(key)
+
+        items = []
+        for start in range(0, len(unique_keys), BATCH_GET_LIMIT):
+            request = {'Keys': unique_keys[start:start + BATCH_GET_LIMIT]}
+            self._projection(request, attributes)
+            attempt = 0
+            while request:
+                try:
+                    response = self.client.batch_get_item(RequestItems={self.table_name: request})
+                except ClientError as e:
+                    print(f"Error batch getting from {self.table_name}: {e}")
+                    break
+                items.extend(response.get('Responses', {}).get(self.table_name, []))
+                request = response.get('UnprocessedKeys', {}).get(self.table_name)
+                if not request:
+                    break
+                if attempt >= max_retries:
+                    print(f"Giving up on {len(request['Keys'])} unprocessed keys for {self.table_name}")
+                    break
+                time.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+        return items
+
+    def scan_items(self, attributes: Optional[List[str]] = None, total_segments: int = 1):
+        """
+        Generic scan method. Reads every page of the table.
+        """
+        if total_segments > 1:
+            return self.parallel_scan(total_segments, attributes)
+        return list(self.iter_scan(attributes))
+
+    def query_items(self, key_condition_expression, expression_attribute_values, **kwargs):
+        """
+        Generic query method. Reads every page of the partition.
+        """
+        return list(self.iter_query(key_condition_expression, expression_attribute_values, **kwargs))
+
+    def update_item(self, key: Dict[str, Any], update_expression: str,
+                    expression_attribute_values: Optional[Dict[str, Any]] = None,
+                    expression_attribute_names: Optional[Dict[str, str]] = None,
+                    condition_expression: Optional[str] = None):
+        """
+        Generic update method. Returns the updated item, or None if the
+        condition did not hold or the update failed.
+        """
+        kwargs = {'Key': key, 'UpdateExpression': update_expression, 'ReturnValues': 'ALL_NEW'}
+        if expression_attribute_values:
+            kwargs['ExpressionAttributeValues'] = expression_attribute_values
+        if expression_attribute_names:
+            kwargs['ExpressionAttributeNames'] = expression_attribute_names
+        if condition_expression:
+            kwargs['ConditionExpression'] = condition_expression
         try:
-            response = self.table.scan()
-            return response.get('Items', [])
+            response = self.client.update_item(TableName=self.table_name, **kwargs)
+            self._on_write()
+            return response.get('Attributes')
         except ClientError as e:
-            print(f"Error scanning {self.table_name}: {e}")
-            return []
-
-    def query_items(self, key_condition_expression, expression_attribute_values):
-         try:
-            response = self.table.query(
-                KeyConditionExpression=key_condition_expression,
-                ExpressionAttributeValues=expression_attribute_values
-            )
-            return response.get('Items', [])
-         except ClientError as e:
-            print(f"Error querying {self.table_name}: {e}")
-            return []
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                print(f"Error updating item in {self.table_name}: {e}")
+            return None
+
     def delete_item(self, key: Dict[str, Any]):
         """
         Generic delete item method.
         """
         try:
-            self.table.delete_item(Key=key)
+            self.client.delete_item(TableName=self.table_name, Key=key)
+            self._on_write()
             return True
         except ClientError as e:
             print(f"Error deleting item from {self.table_name}: {e}")
@@ -0,0 +1,37 @@
+import threading
+from typing import Dict, Any, Optional
+from Sources.instagram import InstagramClient
+from Sources.meta import MetaClient
+from Sources.pinterest import PinterestClient
+from Sources.youtube import YouTubeClient
+
+CLIENT_CLASSES = {
+    "instagram": InstagramClient,
+    "facebook": MetaClient,
+    "pinterest": PinterestClient,
+    "youtube": YouTubeClient
+}
+
+
+class ClientPool:
+    """
+    One client per (platform, access token), shared by every account synced
+    with that token during a full sync. Token-level lookups the clients
+    memoize (Instagram account discovery) then run once per token instead of
+    once per account. All clients already share transport.py's connections.
+    """
+
+    def __init__(self):
+        self._clients: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, platform: str, access_token: Optional[str]):
+        key = (platform, access_token)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = CLIENT_CLASSES[platform](access_token)
+            return client
+
+    def __len__(self):
+        return len(self._clients)
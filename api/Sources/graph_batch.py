@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import datetime
+from typing import Dict, Any, List
+from urllib.parse import urlencode
+from Sources import transport
+
+logger = logging.getLogger("social_insights.graph_batch")
+
+# Graph API hard limit on sub-requests per batch call
+MAX_BATCH_SIZE = 50
+
+
+def relative_url(path: str, params: Dict[str, Any] = None) -> str:
+    """Build a batch sub-request URL (relative to the versioned base URL)."""
+    if params:
+        return f"{path}?{urlencode(params)}"
+    return path
+
+
+def unix_time(day: datetime.date) -> int:
+    """Midnight UTC of `day` as a Unix timestamp (Graph `since`/`until`)."""
+    return int(datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc).timestamp())
+
+
+def daily_insight_values(insights_data: Dict[str, Any], metric_fields: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Spread a `period=day` insights response over days:
+    {"YYYY-MM-DD": {field: value}}. A value's `end_time` is the end of the
+    day it covers, so it is attributed to the previous date.
+    `metric_fields` maps a Graph metric name to our field names.
+    """
+    days = {}
+    for metric in insights_data.get("data", []):
+        fields = metric_fields.get(metric.get("name"), [])
+        for value in metric.get("values", []):
+            try:
+                end = datetime.datetime.strptime(value["end_time"], "%Y-%m-%dT%H:%M:%S%z")
+            except (KeyError, ValueError):
+                continue
+            day = (end - datetime.timedelta(days=1)).date().isoformat()
+            for field in fields:
+                days.setdefault(day, {})[field] = value.get("value") or 0
+    return days
+
+
+class GraphBatch:
+    """
+    Executes many Graph API GETs that share one access token as batch calls
+    (up to 50 sub-requests per POST).
+    """
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+        self.base_url = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v19.0")
+
+    def execute(self, relative_urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Run the given GETs and return one parsed body per URL, in order.
+        Failed sub-requests come back as {"error": {...}} like a direct call.
+        """
+        results = []
+        for start in range(0, len(relative_urls), MAX_BATCH_SIZE):
+            chunk = relative_urls[start:start + MAX_BATCH_SIZE]
+            results.extend(self._execute_chunk(chunk))
+        return results
+
+    def _execute_chunk(self, chunk: List[str]) -> List[Dict[str, Any]]:
+        batch = [{"method": "GET", "relative_url": url} for url in chunk]
+        try:
+            res = transport.post(f"{self.base_url}/", data={
+                "access_token": self.access_token,
+                "include_headers": "false",
+                "batch": json.dumps(batch)
+            }, cost=len(chunk), idempotent=True)  # every sub-request is a GET
+            data = res.json()
+        except Exception as e:
+            logger.error(f"Graph batch request failed: {e}")
+            return [{"error": {"message": str(e)}} for _ in chunk]
+
+        if not isinstance(data, list):
+            message = data.get("error", {}).get("message") if isinstance(data, dict) else str(data)
+            logger.error(f"Graph batch error: {message}")
+            return [{"error": {"message": message}} for _ in chunk]
+
+        results = []
+        for response in data:
+            # Sub-requests that did not complete in time come back as null
+            if not response:
+                results.append({"error": {"message": "Batch sub-request did not complete"}})
+                continue
+            try:
+                results.append(json.loads(response.get("body") or "{}"))
+            except ValueError:
+                results.append({"error": {"message": f"Invalid batch response body (HTTP {response.get('code')})"}})
+        return results
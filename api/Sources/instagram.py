@@ -1,16 +1,40 @@
-import requests
+from Sources import transport
+from Sources.graph_batch import GraphBatch, relative_url, unix_time, daily_insight_values
 import json
 import time
 import logging
 import os
+import threading
 
 logger = logging.getLogger("social_insights.instagram")
 
+PROFILE_PARAMS = {"fields": "followers_count,follows_count,media_count,name,username"}
+INSIGHTS_PARAMS = {"metric": "impressions,reach,profile_views", "period": "day"}
+MEDIA_PARAMS = {"fields": "like_count,comments_count,timestamp", "limit": 50}
+# Our field names per daily insight metric, and the widest since/until range allowed
+DAILY_INSIGHT_FIELDS = {
+    "impressions": ["views_organic"],
+    "reach": ["accounts_reached"],
+    "profile_views": ["profile_visits"]
+}
+MAX_INSIGHTS_RANGE_DAYS = 30
+
+
+class AccountNotFound(Exception):
+    """The IG user id no longer exists or is no longer reachable with this token."""
+
+
+def _is_missing_object(error: dict) -> bool:
+    # 100/33: "Object with ID ... does not exist"; 803: alias/id does not exist
+    return (error.get("code") == 100 and error.get("error_subcode") == 33) or error.get("code") == 803
+
 class InstagramClient:
     def __init__(self, access_token: str, account_id: str = None):
         self.access_token = access_token
         self.account_id = account_id
-        self.base_url = "https://graph.facebook.com/v19.0"
+        self.base_url = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v19.0")
+        self._discovered = None
+        self._discovery_lock = threading.Lock()
 
     def get_me(self):
         """Verify token and get user basic info"""
@@ -20,13 +44,13 @@ class InstagramClient:
             "access_token": self.access_token,
             "fields": "id,name,instagram_business_account"
         }
-        res = requests.get(url, params=params, timeout=10)
+        res = transport.get(url, params=params, timeout=10)
         data = res.json()
         logger.info(f"Token 'me' info: {json.dumps(data)}")
         
         # Also check permissions
         perm_url = f"{self.base_url}/me/permissions"
-        perm_res = requests.get(perm_url, params={"access_token": self.access_token}, timeout=10)
+        perm_res = transport.get(perm_url, params={"access_token": self.access_token}, timeout=10)
         logger.info(f"Token permissions: {json.dumps(perm_res.json())}")
         
         return data
@@ -57,7 +81,7 @@ class InstagramClient:
             "access_token": self.access_token,
             "fields": "id,name,category,tasks,instagram_business_account{id,username,profile_picture_url,followers_count}"
         }
-        res = requests.get(url, params=params, timeout=10)
+        res = transport.get(url, params=params, timeout=10)
         data = res.json()
         
         if "error" in data:
@@ -67,7 +91,7 @@ class InstagramClient:
         logger.info(f"Raw Page discovery response: {json.dumps(data)}")
         
         # 3. Check /me/businesses (Optional Business Manager check)
-        biz_res = requests.get(f"{self.base_url}/me/businesses", params={"access_token": self.access_token}, timeout=10)
+        biz_res = transport.get(f"{self.base_url}/me/businesses", params={"access_token": self.access_token}, timeout=10)
         logger.info(f"Business Manager check: {json.dumps(biz_res.json())}")
 
         if "data" in data:
@@ -90,15 +114,38 @@ class InstagramClient:
                     logger.info(f"Page '{page.get('name')}' (ID: {page.get('id')}) has no connected Instagram Business Account.")
         return accounts
 
-    def get_user_insights(self, ig_user_id: str):
+    def discover_accounts(self):
+        """
+        get_accounts(), run at most once per client. A client shared by all
+        accounts of one token (see client_pool.py) discovers once per token.
+        """
+        with self._discovery_lock:
+            if self._discovered is None:
+                self._discovered = self.get_accounts()
+            return self._discovered
+
+    def find_account_id(self, username: str):
+        """Numeric IG user id for `username` among the accounts this token can reach, or None."""
+        available_accounts = self.discover_accounts()
+        # Diagnostic: Log all usernames found for this token
+        found_usernames = [a['username'] for a in available_accounts if a.get('username')]
+        logger.info(f"Token has access to {len(found_usernames)} accounts: {', '.join(found_usernames)}")
+
+        for acc in available_accounts:
+            if (acc.get('username') or '').lower() == username.lower():
+                logger.info(f"Auto-discovered Numeric ID for {username}: {acc['account_id']}")
+                return acc['account_id']
+        return None
+
+    def get_user_insights(self, ig_user_id: str, skip_insights: bool = False):
         """
         Get basic user insights (Followers, Reach, Impressions, Profile Views).
         Metric: impressions, reach, profile_views
         Period: day (or 28 days for some)
         Note: API limits might apply.
+        With skip_insights only the profile is fetched (delta sync reuses the
+        stored insight values until their period rolls over).
         """
-        url = f"{self.base_url}/{ig_user_id}/insights"
-        
         # User/Business discovery metrics
         # For simplicity, getting daily metrics. 
         # But `follower_count` is on the User object itself, not insights.
@@ -106,16 +153,13 @@ class InstagramClient:
         # 1. Get User Profile Data (Followers, Media Count)
         user_url = f"{self.base_url}/{ig_user_id}"
         logger.info(f"Fetching user profile for {ig_user_id}...")
-        user_res = requests.get(user_url, params={
+        user_res = transport.get(user_url, params={
             "access_token": self.access_token,
-            "fields": "followers_count,follows_count,media_count,name,username"
+            **PROFILE_PARAMS
         }, timeout=10)
+        if user_res.status_code == 404:
+            raise AccountNotFound(f"Instagram Profile Error: {ig_user_id} not found")
         user_data = user_res.json()
-        if "error" in user_data:
-            logger.error(f"Discovery error for {ig_user_id}: {user_data['error'].get('message')}")
-            raise Exception(f"Instagram Profile Error: {user_data['error'].get('message')}")
-        
-        logger.info(f"Successfully fetched profile for {user_data.get('username')}")
         
         # 2. Get Insights (Reach, Impressions, Profile Views)
         # allowed period: day, week, days_28, month, lifetime (limited support)
@@ -123,16 +167,36 @@ class InstagramClient:
         # User requested "Views" (Organic/Ads), "Profile Visits", "Interactions", "Accounts Reached"
         
         # 'impressions', 'reach', 'profile_views' supports: period=day
+        insights_data = {}
+        if not skip_insights:
+            url = f"{self.base_url}/{ig_user_id}/insights"
+            params = {
+                "access_token": self.access_token,
+                **INSIGHTS_PARAMS
+            }
+            logger.info(f"Fetching insights for {ig_user_id}...")
+            insights_res = transport.get(url, params=params, timeout=10)
+            insights_data = insights_res.json()
+
+        # 3. Interactions (Likes + Comments on recent media) could be proxies
+        # Or `total_interactions` metric if available (deprecated?)
+        # Let's simple sum interactions from recent media (top 10?)
         
-        params = {
-            "access_token": self.access_token,
-            "metric": "impressions,reach,profile_views",
-            "period": "day" 
-        }
-        logger.info(f"Fetching insights for {ig_user_id}...")
-        insights_res = requests.get(url, params=params, timeout=10)
-        insights_data = insights_res.json()
+        result = self._parse_user_insights(ig_user_id, user_data, insights_data)
+        if skip_insights:
+            result["insights_skipped"] = True
+        return result
+
+    def _parse_user_insights(self, ig_user_id: str, user_data: dict, insights_data: dict):
+        """Map a profile response and an insights response onto our metric schema."""
+        if "error" in user_data:
+            logger.error(f"Discovery error for {ig_user_id}: {user_data['error'].get('message')}")
+            if _is_missing_object(user_data["error"]):
+                raise AccountNotFound(f"Instagram Profile Error: {user_data['error'].get('message')}")
+            raise Exception(f"Instagram Profile Error: {user_data['error'].get('message')}")
         
+        logger.info(f"Successfully fetched profile for {user_data.get('username')}")
+
         if "error" in insights_data:
             logger.error(f"Insights error for {ig_user_id}: {insights_data['error'].get('message')}")
             raise Exception(f"Instagram Insights Error: {insights_data['error'].get('message')}")
@@ -141,7 +205,7 @@ class InstagramClient:
         
         result = {
             "followers_total": user_data.get("followers_count", 0),
-            "followers_new": 0, # Not directly available via API easily without delta tracking locally
+            "followers_new": 0, # Not reported; derived from the stored previous-day snapshot on sync
             "views_organic": 0, # Mapped to impressions?
             "views_ads": 0, # Ads not available in standard Graph API usually
             "interactions": 0, # Need to sum up media interactions?
@@ -157,6 +221,9 @@ class InstagramClient:
                 if item["values"]:
                     # Take the most recent one
                     latest_val = item["values"][-1]["value"]
+                    end_time = item["values"][-1].get("end_time")
+                    if end_time and end_time > result.get("insights_end_time", ""):
+                        result["insights_end_time"] = end_time
                     
                     if name == "impressions":
                         result["views_organic"] = latest_val
@@ -164,13 +231,26 @@ class InstagramClient:
                         result["accounts_reached"] = latest_val
                     elif name == "profile_views":
                         result["profile_visits"] = latest_val
-
-        # 3. Interactions (Likes + Comments on recent media) could be proxies
-        # Or `total_interactions` metric if available (deprecated?)
-        # Let's simple sum interactions from recent media (top 10?)
         
         return result
 
+    def get_daily_insights(self, ig_user_id: str, since, until):
+        """
+        Daily insights for every date in [since, until) (datetime.date), for
+        backfills: {"YYYY-MM-DD": {views_organic, accounts_reached, profile_visits}}.
+        `until` must be at most MAX_INSIGHTS_RANGE_DAYS after `since`.
+        """
+        res = transport.get(f"{self.base_url}/{ig_user_id}/insights", params={
+            "access_token": self.access_token,
+            **INSIGHTS_PARAMS,
+            "since": unix_time(since),
+            "until": unix_time(until)
+        }, timeout=10)
+        data = res.json()
+        if "error" in data:
+            raise Exception(f"Instagram Insights Error: {data['error'].get('message')}")
+        return daily_insight_values(data, DAILY_INSIGHT_FIELDS)
+
     def get_media_interactions(self, ig_user_id: str):
         """
         Get aggregated interactions (like_count + comments_count) from recent media.
@@ -178,12 +258,38 @@ class InstagramClient:
         url = f"{self.base_url}/{ig_user_id}/media"
         params = {
             "access_token": self.access_token,
-            "fields": "like_count,comments_count,timestamp",
-            "limit": 50 
+            **MEDIA_PARAMS
         }
-        res = requests.get(url, params=params, timeout=10)
-        data = res.json()
-        
+        res = transport.get(url, params=params, timeout=10)
+        return self._sum_media_interactions(res.json())
+
+    def iter_media(self, ig_user_id: str, first_page: dict = None, max_pages: int = 20):
+        """
+        Yield the account's media newest first, following the paging cursors
+        for up to `max_pages` pages. `first_page` is an already fetched first
+        response (e.g. from a Graph batch) to continue from.
+        """
+        url = f"{self.base_url}/{ig_user_id}/media"
+        params = {
+            "access_token": self.access_token,
+            **MEDIA_PARAMS
+        }
+        data = first_page
+        for _ in range(max_pages):
+            if data is None:
+                data = transport.get(url, params=params, timeout=10).json()
+            if "error" in data:
+                raise Exception(f"Instagram Media Error: {data['error'].get('message')}")
+            yield from data.get("data", [])
+
+            paging = data.get("paging", {})
+            after = paging.get("cursors", {}).get("after")
+            if not paging.get("next") or not after:
+                return
+            params = dict(params, after=after)
+            data = None
+
+    def _sum_media_interactions(self, data: dict):
         total_interactions = 0
         if "data" in data:
             for media in data["data"]:
@@ -192,3 +298,40 @@ class InstagramClient:
                 total_interactions += media.get("comments_count", 0)
         
         return total_interactions
+
+    def get_user_insights_batch(self, ig_user_ids: list, skip_insights: set = None):
+        """
+        Fetch profile, insights and media for many accounts sharing this token
+        through Graph batch requests (3 sub-requests per account, 50 per call).
+        Insights are not requested for ids in `skip_insights`.
+        Returns {ig_user_id: metrics} with `interactions` already merged;
+        accounts whose sub-requests failed are left out so callers can fall
+        back to the per-account path.
+        """
+        skip_insights = skip_insights or set()
+        urls = []
+        for ig_user_id in ig_user_ids:
+            urls.append(relative_url(ig_user_id, PROFILE_PARAMS))
+            urls.append(relative_url(f"{ig_user_id}/media", MEDIA_PARAMS))
+            if ig_user_id not in skip_insights:
+                urls.append(relative_url(f"{ig_user_id}/insights", INSIGHTS_PARAMS))
+
+        logger.info(f"Fetching Instagram metrics for {len(ig_user_ids)} accounts via Graph batch...")
+        responses = iter(GraphBatch(self.access_token).execute(urls))
+
+        results = {}
+        for ig_user_id in ig_user_ids:
+            user_data, media_data = next(responses), next(responses)
+            insights_data = {} if ig_user_id in skip_insights else next(responses)
+            try:
+                metrics = self._parse_user_insights(ig_user_id, user_data, insights_data)
+            except Exception as e:
+                logger.warning(f"Batch fetch failed for {ig_user_id}: {e}")
+                continue
+            metrics["interactions"] = self._sum_media_interactions(media_data)
+            # Lets the media aggregator continue paging without refetching page one
+            metrics["media_page"] = media_data
+            if ig_user_id in skip_insights:
+                metrics["insights_skipped"] = True
+            results[ig_user_id] = metrics
+        return results
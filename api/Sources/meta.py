@@ -1,14 +1,29 @@
-import requests
+from Sources import transport
+from Sources.graph_batch import GraphBatch, relative_url, unix_time, daily_insight_values
 import json
 import logging
 import os
 
 logger = logging.getLogger("social_insights.meta")
 
+PAGE_PARAMS = {"fields": "fan_count,name"}
+PAGE_INSIGHTS_PARAMS = {
+    "metric": "page_impressions,page_post_engagements,page_views_total,page_fan_adds",
+    "period": "day"
+}
+DAILY_INSIGHT_FIELDS = {
+    "page_impressions": ["views_organic", "accounts_reached"],
+    "page_post_engagements": ["interactions"],
+    "page_views_total": ["profile_visits"],
+    "page_fan_adds": ["followers_new"]
+}
+# Page insights accept since/until ranges of up to 93 days
+MAX_INSIGHTS_RANGE_DAYS = 90
+
 class MetaClient:
     def __init__(self, access_token: str):
         self.access_token = access_token
-        self.base_url = "https://graph.facebook.com/v19.0"
+        self.base_url = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v19.0")
 
     def get_pages(self):
         """Get Facebook Pages connected to the user."""
@@ -17,7 +32,7 @@ class MetaClient:
             "access_token": self.access_token,
             "fields": "id,name,category,access_token,perms"
         }
-        res = requests.get(url, params=params, timeout=10)
+        res = transport.get(url, params=params, timeout=10)
         data = res.json()
         
         if "error" in data:
@@ -35,10 +50,11 @@ class MetaClient:
                 })
         return pages
 
-    def get_page_insights(self, page_id: str, page_access_token: str = None):
+    def get_page_insights(self, page_id: str, page_access_token: str = None, skip_insights: bool = False):
         """
         Get Facebook Page insights.
         Metrics: page_impressions, page_post_engagements, page_views_total, page_fan_adds
+        With skip_insights only the page object is fetched (delta sync).
         """
         # Use Page Access Token if provided, otherwise use User Access Token (User token usually works if user has permissions)
         token = page_access_token or self.access_token
@@ -54,21 +70,29 @@ class MetaClient:
         
         # 1. Get Page Object for Total Followers
         page_url = f"{self.base_url}/{page_id}"
-        page_res = requests.get(page_url, params={
+        page_res = transport.get(page_url, params={
             "access_token": token,
-            "fields": "fan_count,name"
+            **PAGE_PARAMS
         }, timeout=10)
         page_data = page_res.json()
         
         # 2. Get Insights
-        params = {
-            "access_token": token,
-            "metric": "page_impressions,page_post_engagements,page_views_total,page_fan_adds",
-            "period": "day"
-        }
-        insights_res = requests.get(url, params=params, timeout=10)
-        insights_data = insights_res.json()
+        insights_data = {}
+        if not skip_insights:
+            params = {
+                "access_token": token,
+                **PAGE_INSIGHTS_PARAMS
+            }
+            insights_res = transport.get(url, params=params, timeout=10)
+            insights_data = insights_res.json()
         
+        result = self._parse_page_insights(page_data, insights_data)
+        if skip_insights:
+            result["insights_skipped"] = True
+        return result
+
+    def _parse_page_insights(self, page_data: dict, insights_data: dict):
+        """Map a page object and its insights response onto our metric schema."""
         result = {
             "followers_total": page_data.get("fan_count", 0),
             "followers_new": 0,
@@ -84,6 +108,9 @@ class MetaClient:
                 name = item["name"]
                 if item["values"]:
                     latest_val = item["values"][-1]["value"]
+                    end_time = item["values"][-1].get("end_time")
+                    if end_time and end_time > result.get("insights_end_time", ""):
+                        result["insights_end_time"] = end_time
                     
                     if name == "page_impressions":
                         result["accounts_reached"] = latest_val
@@ -96,3 +123,51 @@ class MetaClient:
                         result["followers_new"] = latest_val
                         
         return result
+
+    def get_daily_page_insights(self, page_id: str, since, until):
+        """
+        Daily page insights for every date in [since, until) (datetime.date),
+        for backfills: {"YYYY-MM-DD": {views_organic, accounts_reached,
+        interactions, profile_visits, followers_new}}.
+        """
+        res = transport.get(f"{self.base_url}/{page_id}/insights", params={
+            "access_token": self.access_token,
+            **PAGE_INSIGHTS_PARAMS,
+            "since": unix_time(since),
+            "until": unix_time(until)
+        }, timeout=10)
+        data = res.json()
+        if "error" in data:
+            raise Exception(f"Facebook Insights Error: {data['error'].get('message')}")
+        return daily_insight_values(data, DAILY_INSIGHT_FIELDS)
+
+    def get_page_insights_batch(self, page_ids: list, skip_insights: set = None):
+        """
+        Fetch page objects and insights for many pages sharing this token
+        through Graph batch requests (2 sub-requests per page, 50 per call).
+        Insights are not requested for ids in `skip_insights`.
+        Returns {page_id: metrics}; pages whose sub-requests failed are left
+        out so callers can fall back to get_page_insights.
+        """
+        skip_insights = skip_insights or set()
+        urls = []
+        for page_id in page_ids:
+            urls.append(relative_url(page_id, PAGE_PARAMS))
+            if page_id not in skip_insights:
+                urls.append(relative_url(f"{page_id}/insights", PAGE_INSIGHTS_PARAMS))
+
+        logger.info(f"Fetching insights for {len(page_ids)} Facebook Pages via Graph batch...")
+        responses = iter(GraphBatch(self.access_token).execute(urls))
+
+        results = {}
+        for page_id in page_ids:
+            page_data = next(responses)
+            insights_data = {} if page_id in skip_insights else next(responses)
+            if "error" in page_data or "error" in insights_data:
+                error = page_data.get("error") or insights_data.get("error")
+                logger.warning(f"Batch fetch failed for page {page_id}: {error.get('message')}")
+                continue
+            results[page_id] = self._parse_page_insights(page_data, insights_data)
+            if page_id in skip_insights:
+                results[page_id]["insights_skipped"] = True
+        return results
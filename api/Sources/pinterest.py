@@ -1,14 +1,15 @@
-import requests
+from Sources import transport
 import logging
 import json
 import os
+import datetime
 
 logger = logging.getLogger("social_insights.pinterest")
 
 class PinterestClient:
     def __init__(self, access_token: str):
         self.access_token = access_token
-        self.base_url = "https://api.pinterest.com/v5"
+        self.base_url = os.getenv("PINTEREST_API_URL", "https://api.pinterest.com/v5")
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
@@ -17,7 +18,7 @@ class PinterestClient:
     def get_account_info(self):
         """Get the authenticated user's account information"""
         url = f"{self.base_url}/user_account"
-        res = requests.get(url, headers=self.headers)
+        res = transport.get(url, headers=self.headers)
         if res.status_code != 200:
             logger.error(f"Error fetching Pinterest account: {res.text}")
             return None
@@ -42,7 +43,7 @@ class PinterestClient:
             "columns": "IMPRESSION,PIN_CLICK,SAVE,ENGAGEMENT,OUTBOUND_CLICK"
         }
         
-        res = requests.get(url, headers=self.headers, params=params)
+        res = transport.get(url, headers=self.headers, params=params)
         if res.status_code != 200:
             logger.error(f"Error fetching Pinterest analytics: {res.text}")
             return None
@@ -81,3 +82,32 @@ class PinterestClient:
             
         logger.info(f"Final aggregated Pinterest stats: {stats}")
         return stats
+
+    def get_daily_analytics(self, since, until):
+        """
+        Daily analytics for every date in [since, until) (datetime.date), for
+        backfills: {"YYYY-MM-DD": {views, clicks, saves, engagements}}.
+        Pinterest serves at most 90 days per request.
+        """
+        url = f"{self.base_url}/user_account/analytics"
+        params = {
+            "start_date": since.isoformat(),
+            "end_date": (until - datetime.timedelta(days=1)).isoformat(),
+            "columns": "IMPRESSION,PIN_CLICK,SAVE,ENGAGEMENT,OUTBOUND_CLICK"
+        }
+        res = transport.get(url, headers=self.headers, params=params)
+        if res.status_code != 200:
+            raise Exception(f"Pinterest Analytics Error: {res.text}")
+
+        days = {}
+        for day in res.json().get("all", {}).get("daily_metrics", []):
+            metrics = day.get("metrics", {})
+            if not day.get("date"):
+                continue
+            days[day["date"]] = {
+                "views": int(metrics.get("IMPRESSION", 0)),
+                "clicks": int(metrics.get("PIN_CLICK", 0)) + int(metrics.get("OUTBOUND_CLICK", 0)),
+                "saves": int(metrics.get("SAVE", 0)),
+                "engagements": int(metrics.get("ENGAGEMENT", 0))
+            }
+        return days
@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import datetime
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger("social_insights.ratelimit")
+
+# Steady requests/second allowed per access token before any usage feedback
+DEFAULT_RATES = {
+    "graph": 20.0,
+    "pinterest": 10.0,
+    "youtube": 10.0
+}
+
+# Graph error codes that mean "throttled": app (4), user (17), page (32),
+# custom (613) and business use case (80001-80014) limits.
+GRAPH_THROTTLE_CODES = {4, 17, 32, 613} | set(range(80001, 80015))
+
+# Below this usage percentage requests run at full rate; above it the rate
+# shrinks linearly down to MIN_FACTOR at 100%.
+THROTTLE_START = 50.0
+MIN_FACTOR = 0.05
+
+# Data API v3 default daily quota; resets at midnight Pacific time
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", 10000))
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of waiting when a platform's budget will not recover soon enough."""
+
+    def __init__(self, platform: str, retry_after: float):
+        super().__init__(f"{platform} rate limit reached, retry in {int(retry_after)}s")
+        self.platform = platform
+        self.retry_after = retry_after
+
+
+def parse_rates(raw: Optional[str]) -> Dict[str, float]:
+    """Parse per-platform rates from a string like "graph=20,youtube=5"."""
+    rates = dict(DEFAULT_RATES)
+    if not raw:
+        return rates
+    for entry in raw.split(","):
+        if "=" not in entry:
+            continue
+        name, value = entry.split("=", 1)
+        try:
+            rates[name.strip().lower()] = max(0.1, float(value))
+        except ValueError:
+            logger.warning(f"Ignoring invalid rate limit entry: {entry}")
+    return rates
+
+
+def platform_for_url(url: str) -> Optional[str]:
+    """
+    Map a request URL to the API whose limits it counts against, using the
+    same base URLs the Sources clients are configured with. Calls elsewhere
+    (OAuth token exchanges etc.) are not limited.
+    """
+    bases = [
+        (os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v19.0"), "graph"),
+        ("https://graph.facebook.com", "graph"),
+        (os.getenv("PINTEREST_API_URL", "https://api.pinterest.com/v5"), "pinterest"),
+        (os.getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3"), "youtube"),
+        (os.getenv("YOUTUBE_ANALYTICS_URL", "https://youtubeanalytics.googleapis.com/v2/reports"), "youtube")
+    ]
+    for base, platform in bases:
+        if url.startswith(base):
+            return platform
+    return None
+
+
+def token_from_request(params=None, headers=None, data=None) -> Optional[str]:
+    """The access token a request is made with (query string, form body or bearer header)."""
+    for source in (params, data):
+        if isinstance(source, dict) and source.get("access_token"):
+            return source["access_token"]
+    if headers:
+        auth = headers.get("Authorization") or headers.get("authorization") or ""
+        if auth.startswith("Bearer "):
+            return auth[len("Bearer "):]
+    return None
+
+
+def token_fingerprint(token: Optional[str]) -> str:
+    """Stable, non-reversible label for a token (budgets are reported without secrets)."""
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+def usage_factor(usage_pct: Optional[float]) -> float:
+    """Fraction of the base rate to use at the reported usage percentage."""
+    if usage_pct is None or usage_pct <= THROTTLE_START:
+        return 1.0
+    if usage_pct >= 100:
+        return MIN_FACTOR
+    span = (usage_pct - THROTTLE_START) / (100 - THROTTLE_START)
+    return max(MIN_FACTOR, 1.0 - span * (1.0 - MIN_FACTOR))
+
+
+def _parse_json_header(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def _usage_pct(usage: Dict[str, Any]) -> float:
+    return max(float(usage.get(key) or 0) for key in ("call_count", "total_cputime", "total_time"))
+
+
+def _pacific_midnight_in() -> float:
+    """Seconds until the YouTube quota resets (midnight America/Los_Angeles)."""
+    try:
+        from zoneinfo import ZoneInfo
+        now = datetime.datetime.now(ZoneInfo("America/Los_Angeles"))
+    except Exception:
+        now = datetime.datetime.utcnow() - datetime.timedelta(hours=8)
+    midnight = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+
+class _Bucket:
+    """Token bucket for one platform+token, with the usage last reported for it."""
+
+    def __init__(self, rate: float):
+        self.base_rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.usage_pct: Optional[float] = None
+        self.paused_until = 0.0
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+
+    def rate(self, app_factor: float) -> float:
+        return self.base_rate * min(app_factor, usage_factor(self.usage_pct))
+
+    def reserve(self, cost: float, rate: float, now: float) -> float:
+        """Take `cost` tokens and return how long the caller must wait for them."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= cost
+        wait = -self.tokens / rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+
+class RateLimiter:
+    """
+    Shared client-side rate limiter for the upstream APIs.
+
+    Each (platform, access token) pair gets a token bucket. Its rate starts
+    at the configured base rate and is scaled down as the platform reports
+    rising usage:
+
+    - Graph: `X-App-Usage` (app-wide, slows every token) and
+      `X-Business-Use-Case-Usage` (per token, incl. time to regain access)
+    - Pinterest: `X-RateLimit-Limit/Remaining/Reset`
+    - YouTube: no headers, so quota units are counted against the daily quota
+
+    Throttling errors (Graph codes 4/17/32/613/800xx, HTTP 429 with
+    Retry-After, YouTube quotaExceeded) pause the bucket. Callers wait for
+    their turn; if that would take longer than `max_wait` seconds,
+    RateLimitExceeded is raised so one account fails fast instead of holding
+    a sync worker.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, max_wait: Optional[float] = None,
+                 cooldown: Optional[float] = None):
+        self.rates = rates or parse_rates(os.getenv("RATE_LIMITS"))
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv("RATE_LIMIT_MAX_WAIT", 30))
+        # How long to back off after a throttling error that gives no reset time
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("RATE_LIMIT_COOLDOWN", 60))
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._app_usage: Dict[str, float] = {}
+        self._app_paused_until: Dict[str, float] = {}
+        self._youtube_units = 0
+        self._youtube_reset_at = time.monotonic() + _pacific_midnight_in()
+
+    def _bucket(self, platform: str, token: Optional[str]) -> _Bucket:
+        key = (platform, token_fingerprint(token))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.rates.get(platform, DEFAULT_RATES.get(platform, 10.0)))
+        return bucket
+
+    def reserve(self, platform: str, token: Optional[str], cost: float = 1) -> float:
+        """
+        Claim budget for a request of `cost` calls and return the seconds to
+        wait before sending it (the caller sleeps, so async code can await).
+        """
+        now = time.monotonic()
+        with self._lock:
+            if platform == "youtube":
+                if now >= self._youtube_reset_at:
+                    self._youtube_units = 0
+                    self._youtube_reset_at = now + _pacific_midnight_in()
+                if self._youtube_units + cost > YOUTUBE_DAILY_QUOTA:
+                    raise RateLimitExceeded(platform, self._youtube_reset_at - now)
+
+            bucket = self._bucket(platform, token)
+            app_factor = usage_factor(self._app_usage.get(platform))
+            wait = bucket.reserve(cost, bucket.rate(app_factor), now)
+            wait = max(wait, self._app_paused_until.get(platform, 0.0) - now)
+            if wait > self.max_wait:
+                # Give the tokens back; this request is not going to be sent
+                bucket.tokens += cost
+                raise RateLimitExceeded(platform, wait)
+            if platform == "youtube":
+                self._youtube_units += cost
+        return wait
+
+    def observe(self, platform: str, token: Optional[str], response):
+        """Update budgets from a response's rate-limit headers and errors."""
+        headers = response.headers
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(platform, token)
+
+            if platform == "graph":
+                app_usage = _parse_json_header(headers.get("x-app-usage"))
+                if isinstance(app_usage, dict):
+                    self._app_usage[platform] = _usage_pct(app_usage)
+                    if self._app_usage[platform] >= 100:
+                        self._app_paused_until[platform] = now + self.cooldown
+
+                buc_usage = _parse_json_header(headers.get("x-business-use-case-usage"))
+                if isinstance(buc_usage, dict):
+                    entries = [entry for entries in buc_usage.values() if isinstance(entries, list) for entry in entries]
+                    if entries:
+                        bucket.usage_pct = max(_usage_pct(entry) for entry in entries)
+                        regain_minutes = max(float(entry.get("estimated_time_to_regain_access") or 0) for entry in entries)
+                        if regain_minutes > 0:
+                            bucket.paused_until = max(bucket.paused_until, now + regain_minutes * 60)
+
+            elif platform == "pinterest":
+                try:
+                    bucket.limit = int(headers["x-ratelimit-limit"])
+                    bucket.remaining = int(headers["x-ratelimit-remaining"])
+                except (KeyError, ValueError):
+                    pass
+                else:
+                    if bucket.limit > 0:
+                        bucket.usage_pct = 100.0 * (1 - bucket.remaining / bucket.limit)
+                    if bucket.remaining <= 0:
+                        bucket.paused_until = max(bucket.paused_until, now + self._reset_in(headers.get("x-ratelimit-reset")))
+
+            if response.status_code == 429:
+                retry_after = self._reset_in(headers.get("retry-after"))
+                bucket.paused_until = max(bucket.paused_until, now + retry_after)
+            elif response.status_code >= 400:
+                self._observe_error(platform, bucket, response, now)
+
+    def _observe_error(self, platform: str, bucket: _Bucket, response, now: float):
+        try:
+            error = response.json().get("error") or {}
+        except Exception:
+            return
+        if not isinstance(error, dict):
+            return
+        if platform == "graph" and error.get("code") in GRAPH_THROTTLE_CODES:
+            logger.warning(f"Graph API throttled (code {error.get('code')}), backing off {int(self.cooldown)}s")
+            if error.get("code") == 4:
+                self._app_paused_until[platform] = now + self.cooldown
+            else:
+                bucket.paused_until = max(bucket.paused_until, now + self.cooldown)
+        elif platform == "youtube":
+            reasons = {e.get("reason") for e in error.get("errors", []) if isinstance(e, dict)}
+            if reasons & {"quotaExceeded", "dailyLimitExceeded"}:
+                logger.warning("YouTube daily quota exhausted")
+                self._youtube_units = YOUTUBE_DAILY_QUOTA
+            elif reasons & {"rateLimitExceeded", "userRateLimitExceeded"}:
+                bucket.paused_until = max(bucket.paused_until, now + self.cooldown)
+
+    def _reset_in(self, value: Optional[str]) -> float:
+        """Seconds until reset from a Retry-After / X-RateLimit-Reset value (delta or epoch)."""
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            return self.cooldown
+        if seconds > 1e9:
+            seconds -= time.time()
+        return max(0.0, seconds)
+
+    def budget(self) -> Dict[str, Any]:
+        """Current remaining budget per platform and token, for monitoring."""
+        now = time.monotonic()
+        with self._lock:
+            platforms = {}
+            for (platform, fingerprint), bucket in self._buckets.items():
+                app_factor = usage_factor(self._app_usage.get(platform))
+                entry = platforms.setdefault(platform, {
+                    "app_usage_pct": self._app_usage.get(platform),
+                    "app_paused_for": max(0, round(self._app_paused_until.get(platform, 0.0) - now, 1)),
+                    "tokens": {}
+                })
+                entry["tokens"][fingerprint] = {
+                    "rate_per_second": round(bucket.rate(app_factor), 3),
+                    "available": round(max(0.0, min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate(app_factor))), 2),
+                    "usage_pct": bucket.usage_pct,
+                    "remaining": bucket.remaining,
+                    "limit": bucket.limit,
+                    "paused_for": max(0, round(bucket.paused_until - now, 1))
+                }
+            platforms.setdefault("youtube", {"tokens": {}})
+            platforms["youtube"]["quota_units_used"] = self._youtube_units
+            platforms["youtube"]["quota_units_remaining"] = max(0, YOUTUBE_DAILY_QUOTA - self._youtube_units)
+            platforms["youtube"]["quota_resets_in"] = round(self._youtube_reset_at - now)
+        return platforms
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every Sources client."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
@@ -0,0 +1,193 @@
+import os
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger("social_insights.resilience")
+
+# Upstream statuses worth another attempt
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+RETRY_BASE_DELAY = float(os.getenv("HTTP_RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("HTTP_RETRY_MAX_DELAY", 8))
+# A Retry-After longer than this is not waited for; the response is returned as is
+RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", 30))
+
+BREAKER_THRESHOLD = int(os.getenv("HTTP_BREAKER_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(os.getenv("HTTP_BREAKER_RESET_SECONDS", 30))
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while a host's circuit breaker is open."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"{host} is failing, circuit open for another {int(retry_in)}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current sync has used up its wall-clock budget."""
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Seconds from a Retry-After header (delay form only), or None."""
+    value = response.headers.get("retry-after")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one upstream host.
+
+    After `threshold` failures in a row (timeouts, connection errors, 5xx)
+    the circuit opens and calls fail immediately for `reset_seconds`. Then a
+    single trial call is let through (half-open): success closes the circuit,
+    failure opens it again. A trial that ends without either (cancelled,
+    unexpected error) gives its slot back, see attempt().
+    """
+
+    def __init__(self, host: str, threshold: int = BREAKER_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.host = host
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._trial_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def _raise_if_blocked(self, state: str):
+        if state == "open" or (state == "half_open" and self.trial_in_flight):
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(self.host, retry_in)
+
+    def check(self):
+        """Raise CircuitOpenError if a call would be refused, without taking the trial slot."""
+        with self._lock:
+            self._raise_if_blocked(self.state)
+
+    def before_call(self) -> Optional[int]:
+        """
+        Admit one call or raise CircuitOpenError. Returns an id when the call
+        is the half-open trial (for release_trial()), else None.
+        """
+        with self._lock:
+            state = self.state
+            self._raise_if_blocked(state)
+            if state == "closed":
+                return None
+            self.trial_in_flight = True
+            self._trial_id += 1
+            return self._trial_id
+
+    def release_trial(self, trial_id: Optional[int]):
+        """Free the trial slot taken by before_call() if that trial never recorded an outcome."""
+        with self._lock:
+            if trial_id is not None and self.trial_in_flight and self._trial_id == trial_id:
+                self.trial_in_flight = False
+
+    @contextmanager
+    def attempt(self):
+        """Guard one upstream call: before_call() on entry, release_trial() on exit."""
+        trial_id = self.before_call()
+        try:
+            yield
+        finally:
+            self.release_trial(trial_id)
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit for {self.host} closed again")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            was_trial = self.trial_in_flight
+            self.trial_in_flight = False
+            if was_trial or self.failures >= self.threshold:
+                if self.opened_at is None or was_trial:
+                    logger.warning(f"Circuit for {self.host} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"host": self.host, "state": self.state, "consecutive_failures": self.failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.stats() for breaker in breakers]
+
+
+# Deadlines are per thread: each sync worker thread runs under the budget of
+# the sync that started it.
+_local = threading.local()
+
+
+def deadline_in(seconds: Optional[float]) -> Optional[float]:
+    """Absolute (monotonic) deadline `seconds` from now; None or <= 0 means no deadline."""
+    if not seconds or seconds <= 0:
+        return None
+    return time.monotonic() + seconds
+
+
+@contextmanager
+def deadline(at: Optional[float]):
+    """Run the block with upstream calls bounded by the absolute deadline `at`."""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = at
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current thread's deadline, or None without one."""
+    at = getattr(_local, "deadline", None)
+    if at is None:
+        return None
+    return at - time.monotonic()
+
+
+def check_deadline():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Sync deadline exceeded")
@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+import threading
+import httpx
+from typing import Optional
+from Sources import ratelimit, resilience
+import instrumentation
+
+logger = logging.getLogger("social_insights.transport")
+
+# httpx logs every request URL at INFO, and our Graph/YouTube calls carry the
+# access token in the query string.
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+
+# Client-side throttling against the platforms' rate limits (see ratelimit.py)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("false", "0", "no")
+
+_lock = threading.Lock()
+_client = None
+
+
+def _limits() -> httpx.Limits:
+    """Pool bounds of the shared client (per process)."""
+    max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", max_connections)),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+    )
+
+
+def get_client() -> httpx.Client:
+    """
+    Shared blocking client used by the Sources clients and auth helpers.
+    Connections are kept alive and pooled per host, so repeated calls to
+    graph.facebook.com etc. skip the TCP+TLS handshake.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(http2=HTTP2_AVAILABLE, limits=_limits(), timeout=DEFAULT_TIMEOUT)
+    return _client
+
+
+def _rate_limited(url: str, params, headers, data):
+    """(platform, token) the request counts against, or None if it is not limited."""
+    if not RATE_LIMIT_ENABLED:
+        return None
+    platform = ratelimit.platform_for_url(url)
+    if platform is None:
+        return None
+    return platform, ratelimit.token_from_request(params, headers, data)
+
+
+def _attempts(method: str, idempotent: Optional[bool]) -> int:
+    """Only idempotent requests (GETs unless told otherwise) are retried."""
+    if idempotent is None:
+        idempotent = method.upper() == "GET"
+    return resilience.MAX_RETRIES + 1 if idempotent else 1
+
+
+def _timeout(timeout: Optional[float]) -> float:
+    """Request timeout, shortened to what is left of the current sync deadline."""
+    timeout = timeout if timeout is not None else DEFAULT_TIMEOUT
+    resilience.check_deadline()
+    left = resilience.remaining()
+    return min(timeout, left) if left is not None else timeout
+
+
+def _throttle_wait(limited, cost: float) -> float:
+    wait = ratelimit.get_limiter().reserve(*limited, cost=cost)
+    left = resilience.remaining()
+    if left is not None and wait >= left:
+        raise resilience.DeadlineExceeded("Sync deadline exceeded while waiting for rate limit budget")
+    return wait
+
+
+def _retry_delay(attempt: int, attempts: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+    """Seconds to wait before the next attempt, or None to stop retrying."""
+    if attempt + 1 >= attempts:
+        return None
+    delay = resilience.backoff_delay(attempt)
+    if response is not None:
+        retry_after = resilience.retry_after_seconds(response)
+        if retry_after is not None:
+            if retry_after > resilience.RETRY_AFTER_MAX:
+                return None
+            delay = retry_after
+    left = resilience.remaining()
+    if left is not None and delay >= left:
+        return None
+    return delay
+
+
+def _observe(limited, url: str, status: str, started: float):
+    """Record one attempt's latency and outcome, labelled by platform and endpoint."""
+    platform = limited[0] if limited else ratelimit.platform_for_url(url)
+    instrumentation.observe_upstream(platform, httpx.URL(url).path, status, time.monotonic() - started)
+
+
+def _record_outcome(breaker: resilience.CircuitBreaker, response: httpx.Response):
+    # 4xx are the caller's problem (bad token, missing permission), not an outage
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def request(method: str, url: str, params=None, headers=None, data=None, json=None, timeout=None,
+            cost: float = 1, idempotent: Optional[bool] = None) -> httpx.Response:
+    """
+    Drop-in for requests.request(); the response exposes .json(), .status_code and .text.
+
+    `cost` is the number of API calls the request counts as (e.g. Graph batch
+    size). Idempotent requests (GETs by default) are retried with jittered
+    exponential backoff on timeouts, connection errors, 429 and 5xx, honouring
+    Retry-After. May raise ratelimit.RateLimitExceeded,
+    resilience.CircuitOpenError or resilience.DeadlineExceeded instead of
+    sending the request.
+    """
+    limited = _rate_limited(url, params, headers, data)
+    host = httpx.URL(url).netloc.decode()  # host[:port]
+    breaker = resilience.get_breaker(host)
+    attempts = _attempts(method, idempotent)
+    for attempt in range(attempts):
+        resilience.check_deadline()
+        # Fail fast without spending rate limit budget while the circuit is open
+        breaker.check()
+        if limited:
+            wait = _throttle_wait(limited, cost)
+            if wait > 0:
+                time.sleep(wait)
+        request_timeout = _timeout(timeout)
+        # Admitted right before sending, so a half-open trial is never held by a
+        # call that gets cut off by throttling or the deadline first
+        with breaker.attempt():
+            started = time.monotonic()
+            try:
+                response = get_client().request(
+                    method, url, params=params, headers=headers, data=data, json=json, timeout=request_timeout
+                )
+            except httpx.TransportError as e:
+                _observe(limited, url, type(e).__name__, started)
+                breaker.record_failure()
+                delay = _retry_delay(attempt, attempts)
+                if delay is None:
+                    raise
+                logger.warning(f"{method} {host} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            else:
+                _observe(limited, url, str(response.status_code), started)
+                if limited:
+                    ratelimit.get_limiter().observe(*limited, response)
+                _record_outcome(breaker, response)
+                if response.status_code not in resilience.RETRYABLE_STATUSES:
+                    return response
+                delay = _retry_delay(attempt, attempts, response)
+                if delay is None:
+                    return response
+                logger.warning(f"{method} {host} returned {response.status_code}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def get(url: str, **kwargs) -> httpx.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+def close():
+    """Close the shared client (on app shutdown or at the end of a script)."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
@@ -1,4 +1,4 @@
-import requests
+from Sources import transport
 import logging
 import os
 from datetime import datetime, timedelta
@@ -8,8 +8,8 @@ logger = logging.getLogger("social_insights.youtube")
 class YouTubeClient:
     def __init__(self, access_token: str):
         self.access_token = access_token
-        self.base_url = "https://www.googleapis.com/youtube/v3"
-        self.analytics_url = "https://youtubeanalytics.googleapis.com/v2/reports"
+        self.base_url = os.getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3")
+        self.analytics_url = os.getenv("YOUTUBE_ANALYTICS_URL", "https://youtubeanalytics.googleapis.com/v2/reports")
 
     def get_channels(self):
         """Get YouTube channels connected to the user."""
@@ -20,7 +20,7 @@ class YouTubeClient:
             "access_token": self.access_token
         }
         try:
-            res = requests.get(url, params=params, timeout=10)
+            res = transport.get(url, params=params, timeout=10)
             data = res.json()
         except Exception as e:
             logger.error(f"Network error fetching YouTube Channels: {e}")
@@ -42,10 +42,11 @@ class YouTubeClient:
                 })
         return channels
 
-    def get_channel_insights(self, channel_id: str):
+    def get_channel_insights(self, channel_id: str, skip_analytics: bool = False):
         """
         Get YouTube Channel insights using YouTube Analytics API.
         Metrics mapped to our standard format.
+        With skip_analytics only the subscriber count is fetched (delta sync).
         """
         # 1. Get current stats via Data API (for total followers)
         url = f"{self.base_url}/channels"
@@ -57,7 +58,7 @@ class YouTubeClient:
         
         followers_total = 0
         try:
-            res = requests.get(url, params=params, timeout=10)
+            res = transport.get(url, params=params, timeout=10)
             data = res.json()
             if "items" in data and len(data["items"]) > 0:
                 followers_total = int(data["items"][0]["statistics"].get("subscriberCount", 0))
@@ -88,12 +89,18 @@ class YouTubeClient:
             "accounts_reached": 0
         }
 
+        if skip_analytics:
+            result["insights_skipped"] = True
+            return result
+
         try:
-            res = requests.get(self.analytics_url, params=analytics_params, timeout=10)
+            res = transport.get(self.analytics_url, params=analytics_params, timeout=10)
             data = res.json()
             
             if "rows" in data and len(data["rows"]) > 0:
                 latest_row = data["rows"][0]
+                # Only set when a report row came back; errors and empty reports leave zeros
+                result["analytics_day"] = latest_row[0]
                 # Map based on standard column headers index
                 # views, subscribersGained, likes, comments, shares, estimatedMinutesWatched
                 result["views_organic"] = int(latest_row[1])
@@ -106,3 +113,33 @@ class YouTubeClient:
                 logger.error(f"YouTube API raw error: {data}")
 
         return result
+
+    def get_daily_channel_insights(self, channel_id: str, since, until):
+        """
+        Daily analytics for every date in [since, until) (datetime.date), for
+        backfills: {"YYYY-MM-DD": {views_organic, accounts_reached,
+        followers_new, interactions}}.
+        """
+        res = transport.get(self.analytics_url, params={
+            "ids": f"channel=={channel_id}",
+            "startDate": since.isoformat(),
+            "endDate": (until - timedelta(days=1)).isoformat(),
+            "metrics": "views,subscribersGained,likes,comments,shares",
+            "dimensions": "day",
+            "sort": "day",
+            "access_token": self.access_token
+        }, timeout=10)
+        data = res.json()
+        if "error" in data:
+            raise Exception(f"YouTube Analytics Error: {data['error'].get('message')}")
+
+        days = {}
+        for row in data.get("rows", []):
+            # day, views, subscribersGained, likes, comments, shares
+            days[row[0]] = {
+                "views_organic": int(row[1]),
+                "accounts_reached": int(row[1]),
+                "followers_new": int(row[2]),
+                "interactions": int(row[3]) + int(row[4]) + int(row[5])
+            }
+        return days
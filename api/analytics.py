@@ -0,0 +1,146 @@
+import math
+import datetime
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+from rollups import METRIC_FIELDS
+
+DEFAULT_FIELDS = ("followers_total", "interactions", "accounts_reached", "views_organic")
+DEFAULT_WINDOW = 7
+
+
+def _to_list(values: np.ndarray, digits: int = 4) -> List[Optional[float]]:
+    """JSON-ready list: NaN/inf become None, whole numbers become ints."""
+    out = []
+    for value in values.tolist():
+        if value is None or not math.isfinite(value):
+            out.append(None)
+        elif value == int(value):
+            out.append(int(value))
+        else:
+            out.append(round(value, digits))
+    return out
+
+
+def daily_series(rows: List[Dict[str, Any]], fields: Sequence[str]):
+    """
+    Collapse metric rows (any order) to one value per calendar day and
+    field — the day's latest row that has the field — over a gap-free
+    range of days. Returns (days as datetime64[D], {field: float array});
+    days without a value for a field are NaN.
+    """
+    rows = [row for row in rows if row.get('timestamp')]
+    if not rows:
+        return np.array([], dtype="datetime64[D]"), {field: np.array([]) for field in fields}
+
+    stamps = np.array([row['timestamp'][:19] for row in rows], dtype="datetime64[s]")
+    order = np.argsort(stamps, kind="stable")
+    days = stamps[order].astype("datetime64[D]")
+    start, end = days[0], days[-1]
+    calendar = np.arange(start, end + np.timedelta64(1, "D"), dtype="datetime64[D]")
+
+    series = {}
+    for field in fields:
+        raw = np.array([
+            np.nan if rows[i].get(field) is None else float(rows[i][field]) for i in order
+        ], dtype=float)
+        present = ~np.isnan(raw)
+        field_days, field_values = days[present], raw[present]
+        # Last value of each day (rows are sorted, so a day ends where the next one starts)
+        last_of_day = np.append(field_days[1:] != field_days[:-1], True) if len(field_days) else present[:0]
+        values = np.full(len(calendar), np.nan)
+        values[(field_days[last_of_day] - start).astype(int)] = field_values[last_of_day]
+        series[field] = values
+    return calendar, series
+
+
+def delta(values: np.ndarray) -> np.ndarray:
+    """Change from the previous day (NaN for the first day or next to gaps)."""
+    return np.concatenate(([np.nan], np.diff(values))) if len(values) else values
+
+
+def pct_change(values: np.ndarray) -> np.ndarray:
+    """Percent change from the previous day; NaN where the previous value is 0 or missing."""
+    if not len(values):
+        return values
+    previous = np.concatenate(([np.nan], values[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (values - previous) / previous * 100
+    change[previous == 0] = np.nan
+    return change
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing `window`-day mean over the days that have a value (NaN if none do)."""
+    if not len(values):
+        return values
+    present = ~np.isnan(values)
+    sums = np.cumsum(np.where(present, values, 0.0))
+    counts = np.cumsum(present)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / counts
+    means[counts == 0] = np.nan
+    return means
+
+
+def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = numerator / denominator
+    result[~(denominator > 0)] = np.nan
+    return result
+
+
+def _summary(values: np.ndarray) -> Dict[str, Any]:
+    present = values[~np.isnan(values)]
+    if not len(present):
+        return {"first": None, "last": None, "change": None, "pct_change": None}
+    first, last = present[0], present[-1]
+    pct = (last - first) / first * 100 if first else np.nan
+    return dict(zip(("first", "last", "change", "pct_change"), _to_list(np.array([first, last, last - first, pct]))))
+
+
+def analyze(rows: List[Dict[str, Any]], fields: Sequence[str] = DEFAULT_FIELDS,
+            window: int = DEFAULT_WINDOW) -> Dict[str, Any]:
+    """
+    Derived daily KPIs of one account's metric rows: for every field the
+    daily value, delta, percent change and `window`-day moving average, plus
+    engagement rate (interactions / accounts_reached) and its moving average.
+    """
+    needed = list(dict.fromkeys(list(fields) + ["interactions", "accounts_reached"]))
+    days, series = daily_series(rows, needed)
+
+    result = {"dates": [str(day) for day in days], "window": window, "series": {}, "summary": {}}
+    for field in fields:
+        values = series[field]
+        result["series"][field] = {
+            "value": _to_list(values),
+            "delta": _to_list(delta(values)),
+            "pct_change": _to_list(pct_change(values)),
+            f"ma_{window}": _to_list(rolling_mean(values, window))
+        }
+        result["summary"][field] = _summary(values)
+
+    engagement = ratio(series["interactions"], series["accounts_reached"])
+    result["series"]["engagement_rate"] = {
+        "value": _to_list(engagement),
+        f"ma_{window}": _to_list(rolling_mean(engagement, window))
+    }
+    result["summary"]["engagement_rate"] = _summary(engagement)
+    return result
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Comma-separated metric fields (default DEFAULT_FIELDS); raises ValueError for unknown ones."""
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in METRIC_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown metric fields: {', '.join(unknown)}")
+    return names
+
+
+def default_start(days: int) -> str:
+    """Lower bound for analytics queries without `from`."""
+    return (datetime.datetime.utcnow().date() - datetime.timedelta(days=days)).isoformat()
@@ -1,6 +1,6 @@
 
 import os
-import requests
+from Sources import transport
 from urllib.parse import urlencode
 import logging
 
@@ -35,7 +35,7 @@ class InstagramAuth:
         
         # 1. Short-lived token
         try:
-            res = requests.get(self.token_url, params=params, timeout=10)
+            res = transport.get(self.token_url, params=params, timeout=10)
             data = res.json()
         except Exception as e:
             logger.error(f"Network error getting short-lived token: {e}")
@@ -56,7 +56,7 @@ class InstagramAuth:
         }
         
         try:
-            upgrade_res = requests.get(self.token_url, params=upgrade_params, timeout=10)
+            upgrade_res = transport.get(self.token_url, params=upgrade_params, timeout=10)
             long_data = upgrade_res.json()
         except Exception as e:
             logger.error(f"Network error upgrading token: {e}")
@@ -106,7 +106,7 @@ class PinterestAuth:
             "redirect_uri": self.redirect_uri
         }
         
-        res = requests.post(self.token_url, headers=headers, data=data)
+        res = transport.post(self.token_url, headers=headers, data=data)
         token_data = res.json()
         
         if "error" in token_data:
@@ -149,7 +149,7 @@ class MetaAuth:
         
         # 1. Short-lived token
         try:
-            res = requests.get(self.token_url, params=params, timeout=10)
+            res = transport.get(self.token_url, params=params, timeout=10)
             data = res.json()
         except Exception as e:
             logger.error(f"Network error exchanging Meta code: {e}")
@@ -171,7 +171,7 @@ class MetaAuth:
         }
         
         try:
-            upgrade_res = requests.get(self.token_url, params=upgrade_params, timeout=10)
+            upgrade_res = transport.get(self.token_url, params=upgrade_params, timeout=10)
             long_data = upgrade_res.json()
         except Exception as e:
             logger.error(f"Network error upgrading Meta token: {e}")
@@ -215,7 +215,7 @@ class YouTubeAuth:
         }
         
         try:
-            res = requests.post(self.token_url, data=data, timeout=10)
+            res = transport.post(self.token_url, data=data, timeout=10)
             token_data = res.json()
         except Exception as e:
             logger.error(f"Network error exchanging YouTube code: {e}")
@@ -0,0 +1,159 @@
+import os
+import logging
+import datetime
+from typing import Dict, Any, List, Callable, Optional
+from Db.database import DynamoDB
+from rollups import RollupStore
+
+logger = logging.getLogger("social_insights.backfill")
+
+BACKFILL_DAYS = int(os.getenv("BACKFILL_DAYS", 90))
+
+# Widest date range per upstream request
+WINDOW_DAYS = {
+    "instagram": 30,
+    "facebook": 90,
+    "youtube": 90,
+    "pinterest": 90
+}
+
+# How far back each platform serves daily analytics; longer backfills are clamped
+MAX_LOOKBACK_DAYS = {
+    "instagram": 730,
+    "facebook": 730,
+    "youtube": 730,
+    "pinterest": 90
+}
+
+# Backfilled rows are stamped at the end of the day they cover
+DAY_ROW_TIME = "T23:59:59"
+
+# Backfilled rows live in their own partition next to the account's snapshots
+DAY_ROWS_SUFFIX = "#day"
+
+
+def day_rows_id(storage_id: str) -> str:
+    """Partition key of an account's backfilled day rows (e.g. instagram#123#day)."""
+    return f"{storage_id}{DAY_ROWS_SUFFIX}"
+
+
+def date_windows(since: datetime.date, until: datetime.date, max_days: int):
+    """Split [since, until) into consecutive windows of at most `max_days`."""
+    windows = []
+    start = since
+    while start < until:
+        end = min(until, start + datetime.timedelta(days=max_days))
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def to_metric_fields(platform: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a client's daily values onto metric row fields (as the sync_* functions do)."""
+    if platform == "pinterest":
+        return {
+            "views_organic": values.get("views", 0),
+            "accounts_reached": values.get("views", 0),
+            "interactions": values.get("engagements", 0),
+            "profile_visits": values.get("clicks", 0),
+            "saves": values.get("saves", 0)
+        }
+    return dict(values)
+
+
+class Backfiller:
+    """
+    Fills an account's history with one metric row per day.
+
+    The range is fetched in the widest windows each platform allows, every
+    returned day becomes its own row (`period: day`, stamped at 23:59:59)
+    written through a BatchWriter, and the rows are folded into the rollups.
+    Days that already have a backfilled row are skipped, so re-running a
+    backfill neither duplicates rows nor double-counts rollups. Snapshot-only
+    values such as followers_total are not available per day and are left out.
+
+    Day rows are stored under day_rows_id(storage_id), not in the snapshot
+    partition, so "newest snapshot" reads never get a day row instead.
+    """
+
+    def __init__(self, metrics_db: DynamoDB, rollups: RollupStore, latest=None):
+        self.metrics_db = metrics_db
+        self.rollups = rollups
+        # LatestMetricsStore; versions the account's history for ETags
+        self.latest = latest
+
+    def day_rows(self, storage_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                 attributes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """An account's backfilled day rows between the ISO bounds `start`/`end` (inclusive), oldest first."""
+        condition = 'account_id = :acc'
+        values = {':acc': day_rows_id(storage_id)}
+        if start or end:
+            condition += ' AND #ts BETWEEN :from AND :to'
+            values.update({':from': start or '', ':to': end or '9999'})
+        extra = {'ExpressionAttributeNames': {'#ts': 'timestamp'}} if len(values) > 1 else {}
+        return list(self.metrics_db.iter_query(condition, values, attributes=attributes, **extra))
+
+    def existing_days(self, storage_id: str, since: datetime.date, until: datetime.date) -> set:
+        rows = self.day_rows(storage_id, since.isoformat(), until.isoformat(), attributes=['timestamp'])
+        return {row['timestamp'][:10] for row in rows}
+
+    def backfill(self, storage_id: str, platform: str,
+                 fetch_daily: Callable[[datetime.date, datetime.date], Dict[str, Dict[str, Any]]],
+                 days: int = BACKFILL_DAYS) -> Dict[str, Any]:
+        """
+        Backfill the `days` full days before today for one account, at most
+        the platform's MAX_LOOKBACK_DAYS.
+        `fetch_daily(since, until)` returns {"YYYY-MM-DD": values} for [since, until).
+        A window that fails to fetch is reported in `failed_windows`; the
+        other windows are still written.
+        """
+        days = min(days, MAX_LOOKBACK_DAYS.get(platform, days))
+        until = datetime.datetime.utcnow().date()
+        since = until - datetime.timedelta(days=days)
+        done = self.existing_days(storage_id, since, until)
+
+        rows: List[Dict[str, Any]] = []
+        failed_windows: List[Dict[str, str]] = []
+        for window_start, window_end in date_windows(since, until, WINDOW_DAYS.get(platform, 30)):
+            window_days = {(window_start + datetime.timedelta(days=i)).isoformat()
+                           for i in range((window_end - window_start).days)}
+            if window_days <= done:
+                continue
+            try:
+                daily = fetch_daily(window_start, window_end)
+            except Exception as e:
+                logger.error(f"Backfill of {storage_id}: window {window_start} to {window_end} failed: {e}")
+                failed_windows.append({'since': window_start.isoformat(), 'until': window_end.isoformat()})
+                continue
+            for day, values in sorted(daily.items()):
+                if day in done or not since.isoformat() <= day < until.isoformat():
+                    continue
+                rows.append({
+                    'account_id': day_rows_id(storage_id),
+                    'timestamp': f"{day}{DAY_ROW_TIME}",
+                    'platform': platform,
+                    'period': 'day',
+                    'source': 'backfill',
+                    **to_metric_fields(platform, values)
+                })
+
+        with self.metrics_db.batch_writer() as writer:
+            for row in rows:
+                writer.put(row)
+        if writer.failed:
+            logger.error(f"Backfill of {storage_id}: {writer.failed} of {len(rows)} rows failed")
+        # Rollups and the history version are per account, not per partition
+        account_rows = [dict(row, account_id=storage_id) for row in rows]
+        self.rollups.record_many(account_rows)
+        if self.latest is not None:
+            self.latest.record_many(account_rows)
+
+        logger.info(f"Backfilled {writer.written} days for {storage_id} ({len(done)} already present)")
+        return {
+            'account_id': storage_id,
+            'platform': platform,
+            'days_written': writer.written,
+            'days_failed': writer.failed,
+            'days_skipped': len(done),
+            'failed_windows': failed_windows
+        }
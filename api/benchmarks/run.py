@@ -0,0 +1,282 @@
+"""
+Offline benchmark of full syncs and the read endpoints.
+
+Runs the API against local platform stubs (benchmarks/stub_apis.py) and an
+in-memory DynamoDB (moto, when installed) or DynamoDB Local when
+DYNAMODB_ENDPOINT_URL is set. For every account count it measures a cold
+run_full_sync and a second (delta) one — wall time, accounts/s, upstream
+requests — and p50/p99 latency of the main read endpoints.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run                                  # 10, 100 and 1000 accounts
+    python -m benchmarks.run --accounts 100 --latency-ms 150 --error-rate 0.02
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json --fail-on-regression
+
+Each size runs in a fresh process so caches, rate limiters and circuit
+breakers start cold. Results go to benchmarks/results/<UTC time>.json;
+pass an earlier file as --baseline to flag throughput drops and latency
+increases beyond --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import datetime
+import subprocess
+from typing import Dict, Any, List, Optional
+
+from benchmarks.stub_apis import StubConfig, start_stubs, stub_env, stop_stubs
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Accounts sharing one Graph token (as under one business manager)
+GRAPH_ACCOUNTS_PER_TOKEN = 25
+
+# Environment the API is started with unless already set
+BENCHMARK_ENV = {
+    "AWS_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "SYNC_MODE": "inline",
+    "BACKFILL_ON_CONNECT": "false",
+    # Injected throttling should slow the run down, not stall it for a minute
+    "RATE_LIMIT_COOLDOWN": "2",
+    "HTTP_RETRY_BASE_DELAY": "0.1",
+    "HTTP_BREAKER_RESET_SECONDS": "2"
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def build_integrations(count: int, graph_stub) -> List[Dict[str, Any]]:
+    """
+    A platform mix resembling production: 50% Instagram (one in five by
+    username, resolved through account discovery), 20% Facebook pages,
+    20% YouTube channels and 10% Pinterest accounts.
+    """
+    integrations = []
+    for i in range(count):
+        graph_token = f"graph-token-{i // GRAPH_ACCOUNTS_PER_TOKEN}"
+        kind = i % 10
+        if kind < 4:
+            row = {'platform': 'instagram', 'account_id': str(17841400000000000 + i), 'access_token': graph_token}
+        elif kind == 4:
+            username = f"bench_user_{i}"
+            graph_stub.accounts.setdefault(graph_token, []).append({
+                "page_id": str(10400000000000 + i), "ig_user_id": str(17841500000000000 + i), "username": username
+            })
+            row = {'platform': 'instagram', 'account_id': username, 'access_token': graph_token}
+        elif kind < 7:
+            row = {'platform': 'facebook', 'account_id': str(10500000000000 + i), 'access_token': graph_token}
+        elif kind < 9:
+            token = f"youtube-token-{i}"
+            channel_id = "UC" + hashlib.sha1(token.encode()).hexdigest()[:22]
+            row = {'platform': 'youtube', 'account_id': channel_id, 'access_token': token}
+        else:
+            row = {'platform': 'pinterest', 'account_id': f"pin_{i}", 'access_token': f"pinterest-token-{i}"}
+        row['account_name'] = row['account_id']
+        integrations.append(row)
+    return integrations
+
+
+def time_sync(index, servers) -> Dict[str, Any]:
+    for server in servers.values():
+        server.api.reset_counts()
+    started = time.perf_counter()
+    summary = index.run_full_sync()
+    seconds = time.perf_counter() - started
+    compact = index.summarize_sync(summary)
+    return {
+        "seconds": round(seconds, 3),
+        "accounts_per_second": round(summary["total"] / seconds, 2) if seconds else None,
+        "succeeded": compact["succeeded"],
+        "failed": compact["failed"],
+        "skipped": compact["skipped"],
+        "unchanged": compact["unchanged"],
+        "rows_written": compact["rows_written"],
+        "upstream_requests": {name: dict(server.api.requests) for name, server in servers.items()}
+    }
+
+
+def time_endpoints(client, integrations: List[Dict[str, Any]], samples: int) -> Dict[str, Any]:
+    """p50/p99 latency (ms) of the dashboard's read paths, through the ASGI app."""
+    accounts = [(i['platform'], i['account_id']) for i in integrations]
+    batch = {"queries": [{"platform": p, "account_id": a, "limit": 30} for p, a in accounts[:10]]}
+    calls = {
+        "GET /integrations": lambda n: client.get("/integrations"),
+        "GET /metrics/latest": lambda n: client.get("/metrics/latest"),
+        "GET /metrics/{platform}/{account_id}": lambda n: client.get(
+            "/metrics/{}/{}".format(*accounts[n % len(accounts)]), params={"limit": 30}),
+        "POST /metrics/batch": lambda n: client.post("/metrics/batch", json=batch),
+        "GET /metrics/{platform}/{account_id}/rollups": lambda n: client.get(
+            "/metrics/{}/{}/rollups".format(*accounts[n % len(accounts)])),
+        "GET /sync/status": lambda n: client.get("/sync/status")
+    }
+    results = {}
+    for name, call in calls.items():
+        timings, errors = [], 0
+        for n in range(samples):
+            started = time.perf_counter()
+            response = call(n)
+            timings.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code >= 400
+        results[name] = {
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "samples": samples,
+            "errors": errors
+        }
+    return results
+
+
+def run_size(count: int, config: StubConfig, samples: int) -> Dict[str, Any]:
+    """Benchmark one account count in this process."""
+    servers = start_stubs(config)
+    os.environ.update(stub_env(servers))
+    for name, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(name, value)
+
+    mock = None
+    if not os.getenv("DYNAMODB_ENDPOINT_URL"):
+        try:
+            from moto import mock_aws
+        except ImportError:
+            raise SystemExit("Install moto (benchmarks/requirements.txt) or set DYNAMODB_ENDPOINT_URL to a DynamoDB Local")
+        mock = mock_aws()
+        mock.start()
+
+    try:
+        import index
+        from fastapi.testclient import TestClient
+        logging.getLogger().setLevel(os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+
+        with TestClient(index.app) as client:
+            integrations = build_integrations(count, servers["graph"].api)
+            index.integrations_db.save_items(integrations)
+            cold = time_sync(index, servers)
+            # Second run: insights still current, so the delta sync path is measured
+            warm = time_sync(index, servers)
+            endpoints = time_endpoints(client, integrations, samples)
+        return {"accounts": count, "sync": {"cold": cold, "warm": warm}, "endpoints": endpoints}
+    finally:
+        if mock:
+            mock.stop()
+        stop_stubs(servers)
+
+
+def flatten(result: Dict[str, Any]) -> Dict[str, float]:
+    """Comparable numbers of one size: {name: value}; names ending in _ms are lower-is-better."""
+    values = {}
+    for phase, sync in result["sync"].items():
+        values[f"sync.{phase}.accounts_per_second"] = sync["accounts_per_second"]
+    for endpoint, stats in result["endpoints"].items():
+        values[f"{endpoint} p50_ms"] = stats["p50_ms"]
+        values[f"{endpoint} p99_ms"] = stats["p99_ms"]
+    return values
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of `current` against `baseline` beyond `tolerance` (a fraction)."""
+    previous = {r["accounts"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        base = previous.get(result["accounts"])
+        if not base:
+            continue
+        base_values = flatten(base)
+        for name, value in flatten(result).items():
+            old = base_values.get(name)
+            if not old or value is None:
+                continue
+            change = (value - old) / old
+            worse = change > tolerance if name.endswith("_ms") else change < -tolerance
+            if worse:
+                regressions.append(f"{result['accounts']} accounts, {name}: {old} -> {value} ({change:+.0%})")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline sync and endpoint benchmark")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with a rate-limit error")
+    parser.add_argument("--media-per-account", type=int, default=60)
+    parser.add_argument("--samples", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default benchmarks/results/<UTC time>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before flagging")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                        args.media_per_account, seed=args.seed)
+
+    if args.worker is not None:
+        print(json.dumps(run_size(args.worker, config, args.samples)))
+        return
+
+    results = []
+    for count in args.accounts:
+        print(f"Benchmarking {count} accounts...", file=sys.stderr)
+        worker_args = [a for a in sys.argv[1:] if a != "--fail-on-regression"]
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", *worker_args, "--worker", str(count)],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr)
+            raise SystemExit(f"Benchmark of {count} accounts failed")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        cold, warm = result["sync"]["cold"], result["sync"]["warm"]
+        print(f"  sync: {cold['seconds']}s cold ({cold['accounts_per_second']} accounts/s, {cold['failed']} failed), "
+              f"{warm['seconds']}s delta ({warm['accounts_per_second']} accounts/s)", file=sys.stderr)
+        for endpoint, stats in result["endpoints"].items():
+            print(f"  {endpoint}: p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms", file=sys.stderr)
+
+    report = {
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "config": dict(config.to_dict(), samples=args.samples, seed=args.seed),
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if not regressions:
+            print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
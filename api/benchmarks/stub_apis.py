@@ -0,0 +1,399 @@
+"""
+Local stand-ins for the Graph API, YouTube Data/Analytics and Pinterest v5,
+so syncs can be benchmarked without network access or real tokens.
+
+Each platform runs on its own port (so it gets its own circuit breaker) and
+answers the endpoints the Sources clients call with deterministic data per
+account id. Latency, jitter, server errors and rate-limit responses are
+injected according to a StubConfig; every request is counted per endpoint.
+
+    servers = start_stubs(StubConfig(latency_ms=80, error_rate=0.01))
+    os.environ.update(stub_env(servers))
+    ...
+    stop_stubs(servers)
+"""
+import json
+import time
+import random
+import hashlib
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+GRAPH_VERSION = "v19.0"
+
+Reply = Tuple[int, Any, Dict[str, str]]
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, media_per_account: int = 60, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # Fraction of requests answered with a 500 / a platform rate-limit error
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.media_per_account = media_per_account
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def fault(self) -> Optional[str]:
+        """"error", "rate_limit" or None for the next request."""
+        with self._lock:
+            roll = self.random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.rate_limit_rate:
+            return "rate_limit"
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "media_per_account": self.media_per_account
+        }
+
+
+def _number(*parts, low: int = 0, high: int = 10000) -> int:
+    """Stable pseudo-random integer for the given key parts."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+    return low + int(digest[:8], 16) % (high - low)
+
+
+def _days(since: datetime.date, until: datetime.date) -> List[datetime.date]:
+    return [since + datetime.timedelta(days=i) for i in range((until - since).days)]
+
+
+class StubAPI:
+    """One platform's endpoints; subclasses implement route()."""
+
+    name = "stub"
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, endpoint: str):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+
+    def handle(self, method: str, path: str, query: Dict[str, str], form: Dict[str, str],
+               headers: Dict[str, str]) -> Reply:
+        time.sleep(self.config.delay())
+        fault = self.config.fault()
+        if fault == "error":
+            self.count("5xx")
+            return 500, {"error": {"message": "Stub server error", "code": 2}}, {}
+        if fault == "rate_limit":
+            self.count("rate_limited")
+            return self.rate_limited()
+        return self.route(method, path, query, form, headers)
+
+    def rate_limited(self) -> Reply:
+        return 429, {"error": {"message": "Too many requests"}}, {"Retry-After": "1"}
+
+    def route(self, method: str, path: str, query: Dict[str, str], form: Dict[str, str],
+              headers: Dict[str, str]) -> Reply:
+        raise NotImplementedError
+
+
+class GraphStub(StubAPI):
+    """
+    Graph API for Instagram business accounts and Facebook pages, incl.
+    batch requests (POST / with a `batch` form field). `accounts` maps an
+    access token to the pages it manages, for account discovery:
+    [{"page_id", "ig_user_id", "username"}].
+    """
+
+    name = "graph"
+
+    def __init__(self, config: StubConfig):
+        super().__init__(config)
+        self.accounts: Dict[str, List[Dict[str, str]]] = {}
+
+    def rate_limited(self) -> Reply:
+        # Application-level throttling ("Application request limit reached")
+        return 403, {"error": {"message": "Application request limit reached", "code": 4}}, {}
+
+    def route(self, method, path, query, form, headers) -> Reply:
+        segments = [s for s in path.strip("/").split("/") if s]
+        if segments and segments[0].startswith("v") and segments[0][1:2].isdigit():
+            segments = segments[1:]
+        usage = {"X-App-Usage": json.dumps({"call_count": 10, "total_cputime": 5, "total_time": 5})}
+
+        if method == "POST" and not segments:
+            self.count("batch")
+            token = form.get("access_token") or query.get("access_token")
+            try:
+                batch = json.loads(form.get("batch") or "[]")
+            except ValueError:
+                return 400, {"error": {"message": "Invalid batch", "code": 100}}, usage
+            replies = []
+            for sub in batch:
+                parts = urlsplit("/" + sub.get("relative_url", "").lstrip("/"))
+                sub_query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+                status, body = self.get(parts.path.strip("/").split("/"), sub_query, token)
+                replies.append({"code": status, "headers": [], "body": json.dumps(body)})
+            return 200, replies, usage
+
+        self.count("/" + "/".join("{id}" if s.isdigit() else s for s in segments))
+        status, body = self.get(segments, query, query.get("access_token"))
+        return status, body, usage
+
+    def get(self, segments: List[str], query: Dict[str, str], token: Optional[str]) -> Tuple[int, Any]:
+        if not token:
+            return 400, {"error": {"message": "An access token is required", "code": 104}}
+        if segments == ["me"]:
+            return 200, {"id": str(_number("me", token, low=10**9, high=10**10)), "name": "Stub User"}
+        if segments == ["me", "permissions"]:
+            return 200, {"data": [{"permission": p, "status": "granted"} for p in
+                                  ("instagram_basic", "instagram_manage_insights", "pages_show_list", "read_insights")]}
+        if segments == ["me", "businesses"]:
+            return 200, {"data": []}
+        if segments == ["me", "accounts"]:
+            return 200, {"data": [{
+                "id": account["page_id"],
+                "name": f"Page {account['page_id']}",
+                "category": "Brand",
+                "tasks": ["ANALYZE"],
+                "access_token": token,
+                "instagram_business_account": {
+                    "id": account["ig_user_id"],
+                    "username": account["username"],
+                    "followers_count": _number("followers", account["ig_user_id"], low=100, high=100000)
+                }
+            } for account in self.accounts.get(token, [])]}
+
+        if not segments or not segments[0].isdigit():
+            return 400, {"error": {"message": "Unsupported get request", "code": 100, "error_subcode": 33}}
+        object_id = segments[0]
+        edge = segments[1] if len(segments) > 1 else None
+        if edge is None:
+            followers = _number("followers", object_id, low=100, high=100000)
+            return 200, {
+                "id": object_id,
+                "name": f"Account {object_id}",
+                "username": f"user_{object_id}",
+                "followers_count": followers,
+                "follows_count": _number("follows", object_id, high=2000),
+                "media_count": self.config.media_per_account,
+                "fan_count": followers
+            }
+        if edge == "insights":
+            return 200, self.insights(object_id, query)
+        if edge == "media":
+            return 200, self.media(object_id, query)
+        return 400, {"error": {"message": f"Unknown edge {edge}", "code": 100}}
+
+    def insights(self, object_id: str, query: Dict[str, str]) -> Dict[str, Any]:
+        today = datetime.datetime.utcnow().date()
+        if query.get("since") and query.get("until"):
+            since = datetime.datetime.utcfromtimestamp(int(query["since"])).date()
+            until = datetime.datetime.utcfromtimestamp(int(query["until"])).date()
+        else:
+            since, until = today - datetime.timedelta(days=2), today
+        data = []
+        for metric in query.get("metric", "").split(","):
+            data.append({
+                "name": metric,
+                "period": "day",
+                "values": [{
+                    "value": _number(metric, object_id, day, high=5000),
+                    # end_time is the end of the day the value covers
+                    "end_time": f"{(day + datetime.timedelta(days=1)).isoformat()}T07:00:00+0000"
+                } for day in _days(since, until)]
+            })
+        return {"data": data}
+
+    def media(self, object_id: str, query: Dict[str, str]) -> Dict[str, Any]:
+        limit = int(query.get("limit") or 25)
+        offset = int(query.get("after") or 0)
+        total = self.config.media_per_account
+        now = datetime.datetime.utcnow()
+        page = [{
+            "id": f"{object_id}{i:05d}",
+            "like_count": _number("likes", object_id, i, high=500),
+            "comments_count": _number("comments", object_id, i, high=50),
+            # One post every two days, newest first
+            "timestamp": (now - datetime.timedelta(days=2 * i, hours=1)).strftime("%Y-%m-%dT%H:%M:%S+0000")
+        } for i in range(offset, min(total, offset + limit))]
+        body = {"data": page, "paging": {"cursors": {"before": str(offset), "after": str(offset + len(page))}}}
+        if offset + len(page) < total:
+            body["paging"]["next"] = f"https://graph.example/{object_id}/media?after={offset + len(page)}"
+        return body
+
+
+class YouTubeStub(StubAPI):
+    """YouTube Data API v3 (/youtube/v3/channels) and Analytics (/v2/reports)."""
+
+    name = "youtube"
+
+    def rate_limited(self) -> Reply:
+        return 403, {"error": {"code": 403, "message": "Rate limit exceeded",
+                               "errors": [{"reason": "rateLimitExceeded"}]}}, {}
+
+    def route(self, method, path, query, form, headers) -> Reply:
+        if path.rstrip("/").endswith("/channels"):
+            self.count("/channels")
+            if query.get("mine"):
+                channel_id = "UC" + hashlib.sha1(query.get("access_token", "").encode()).hexdigest()[:22]
+                ids = [channel_id]
+            else:
+                ids = [i for i in query.get("id", "").split(",") if i]
+            return 200, {"items": [{
+                "id": channel_id,
+                "snippet": {"title": f"Channel {channel_id}"},
+                "statistics": {"subscriberCount": str(_number("subs", channel_id, low=10, high=500000))}
+            } for channel_id in ids]}, {}
+
+        if path.rstrip("/").endswith("/reports"):
+            self.count("/reports")
+            channel_id = query.get("ids", "").replace("channel==", "")
+            metrics = [m for m in query.get("metrics", "").split(",") if m]
+            since = datetime.date.fromisoformat(query["startDate"])
+            until = datetime.date.fromisoformat(query["endDate"]) + datetime.timedelta(days=1)
+            rows = [[day.isoformat()] + [_number(m, channel_id, day, high=3000) for m in metrics]
+                    for day in _days(since, until)]
+            if query.get("sort", "").startswith("-"):
+                rows.reverse()
+            headers_ = [{"name": "day"}] + [{"name": m} for m in metrics]
+            return 200, {"kind": "youtubeAnalytics#resultTable", "columnHeaders": headers_, "rows": rows}, {}
+
+        self.count("unknown")
+        return 404, {"error": {"code": 404, "message": "Not found"}}, {}
+
+
+class PinterestStub(StubAPI):
+    """Pinterest v5 /user_account and /user_account/analytics (bearer token)."""
+
+    name = "pinterest"
+    COLUMNS = ("IMPRESSION", "PIN_CLICK", "SAVE", "ENGAGEMENT", "OUTBOUND_CLICK")
+
+    def route(self, method, path, query, form, headers) -> Reply:
+        token = headers.get("authorization", "").replace("Bearer ", "")
+        limits = {"X-RateLimit-Limit": "1000", "X-RateLimit-Remaining": "900", "X-RateLimit-Reset": "60"}
+        if not token:
+            return 401, {"code": 2, "message": "Authentication failed"}, limits
+        if path.rstrip("/").endswith("/user_account"):
+            self.count("/user_account")
+            return 200, {
+                "username": f"pin_{hashlib.sha1(token.encode()).hexdigest()[:8]}",
+                "account_type": "BUSINESS",
+                "follower_count": _number("followers", token, low=10, high=50000)
+            }, limits
+        if path.rstrip("/").endswith("/user_account/analytics"):
+            self.count("/user_account/analytics")
+            since = datetime.date.fromisoformat(query["start_date"])
+            until = datetime.date.fromisoformat(query["end_date"]) + datetime.timedelta(days=1)
+            daily = [{
+                "date": day.isoformat(),
+                "data_status": "READY",
+                "metrics": {column: _number(column, token, day, high=2000) for column in self.COLUMNS}
+            } for day in _days(since, until)]
+            return 200, {"all": {"daily_metrics": daily}}, limits
+        self.count("unknown")
+        return 404, {"code": 404, "message": "Not found"}, limits
+
+
+class StubServer:
+    """Serves one StubAPI on 127.0.0.1 (a free port) from a background thread."""
+
+    def __init__(self, api: StubAPI, prefix: str = ""):
+        self.api = api
+        self.prefix = prefix
+        handler = self._handler_class(api)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        # Room for every sync worker's keep-alive connection
+        self.httpd.request_queue_size = 256
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name=f"stub-{api.name}", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{self.prefix}"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @staticmethod
+    def _handler_class(api: StubAPI):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self, method: str):
+                parts = urlsplit(self.path)
+                query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+                length = int(self.headers.get("content-length") or 0)
+                raw = self.rfile.read(length).decode() if length else ""
+                form = {k: v[-1] for k, v in parse_qs(raw).items()}
+                headers = {k.lower(): v for k, v in self.headers.items()}
+                status, body, extra = api.handle(method, parts.path, query, form, headers)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in extra.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def start_stubs(config: StubConfig) -> Dict[str, StubServer]:
+    """Start one stub server per platform."""
+    return {
+        "graph": StubServer(GraphStub(config), f"/{GRAPH_VERSION}").start(),
+        "youtube": StubServer(YouTubeStub(config)).start(),
+        "pinterest": StubServer(PinterestStub(config), "/v5").start()
+    }
+
+
+def stub_env(servers: Dict[str, StubServer]) -> Dict[str, str]:
+    """Base URL overrides that point the Sources clients at the stubs."""
+    youtube = servers["youtube"].url
+    return {
+        "GRAPH_API_URL": servers["graph"].url,
+        "YOUTUBE_API_URL": f"{youtube}/youtube/v3",
+        "YOUTUBE_ANALYTICS_URL": f"{youtube}/v2/reports",
+        "PINTEREST_API_URL": servers["pinterest"].url
+    }
+
+
+def stop_stubs(servers: Dict[str, StubServer]):
+    for server in servers.values():
+        server.stop()
@@ -0,0 +1,196 @@
+"""
+Export metric history to a Parquet dataset for offline analysis.
+
+Rows are read per account with paginated queries (oldest first) and written
+as typed columns — `timestamp` as a UTC timestamp, every metric field as
+int64 — into a Hive-partitioned dataset:
+
+    <output>/platform=instagram/date=2024-05-01/part-<run>-<n>.parquet
+
+At most --max-rows rows are held in memory; buffered partitions are flushed
+to new part files whenever that is reached. Exports are incremental: the
+last exported timestamp of every account is kept in <output>/_export_state.json
+and the next run only queries rows after it.
+
+    pip install pyarrow
+    python export_metrics.py --output exports/metrics
+    python export_metrics.py --output exports/metrics --account instagram/1784...
+
+Read it back with e.g. pyarrow.dataset.dataset(path, partitioning="hive")
+or pandas.read_parquet(path).
+"""
+import os
+import json
+import uuid
+import argparse
+import datetime
+from dotenv import load_dotenv
+from Db.database import DynamoDB
+from rollups import METRIC_FIELDS
+from sync_state import storage_id_for
+from backfill import day_rows_id
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; only this tool needs it
+    pa = None
+
+load_dotenv()
+
+STATE_FILE = "_export_state.json"
+
+
+def schema():
+    return pa.schema(
+        [("account_id", pa.string()), ("platform", pa.string()), ("timestamp", pa.timestamp("us"))]
+        + [(field, pa.int64()) for field in METRIC_FIELDS]
+        + [("period", pa.string()), ("source", pa.string())]
+    )
+
+
+def load_state(output):
+    path = os.path.join(output, STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_exported": {}}
+
+
+def save_state(output, state):
+    path = os.path.join(output, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def to_int(value):
+    # DynamoDB numbers come back as Decimal
+    return None if value is None else int(value)
+
+
+class PartitionWriter:
+    """
+    Buffers rows per (platform, date) partition as column lists and writes
+    them out as Parquet part files once `max_rows` rows are buffered.
+    `flushed` holds, per account, the newest timestamp written so far.
+    """
+
+    def __init__(self, output, max_rows):
+        self.output = output
+        self.max_rows = max_rows
+        self.run_id = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.schema = schema()
+        self.buffers = {}
+        self.buffered = 0
+        self.pending = {}
+        self.flushed = {}
+        self.files = 0
+        self.rows = 0
+
+    def add(self, item, platform):
+        moment = datetime.datetime.fromisoformat(item['timestamp'])
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        key = (item.get('platform') or platform, moment.date().isoformat())
+        columns = self.buffers.get(key)
+        if columns is None:
+            columns = self.buffers[key] = {name: [] for name in self.schema.names}
+        columns['account_id'].append(item['account_id'])
+        columns['platform'].append(key[0])
+        columns['timestamp'].append(moment)
+        for field in METRIC_FIELDS:
+            columns[field].append(to_int(item.get(field)))
+        columns['period'].append(item.get('period'))
+        columns['source'].append(item.get('source'))
+        self.pending[item['account_id']] = item['timestamp']
+        self.buffered += 1
+        if self.buffered >= self.max_rows:
+            self.flush()
+
+    def flush(self):
+        for (platform, date), columns in self.buffers.items():
+            directory = os.path.join(self.output, f"platform={platform}", f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pydict(columns, schema=self.schema)
+            pq.write_table(table, os.path.join(directory, f"part-{self.run_id}-{self.files:05d}.parquet"))
+            self.files += 1
+            self.rows += table.num_rows
+        self.flushed.update(self.pending)
+        self.buffers = {}
+        self.pending = {}
+        self.buffered = 0
+
+
+def accounts_to_export(integrations_db, only=None):
+    """
+    [(platform, partition)] to export: the snapshot and backfilled day row
+    partitions of every integration, or just of `only` ("platform/account_id").
+    """
+    if only:
+        platform, account_id = only.split("/", 1)
+        accounts = {(platform, storage_id_for(platform, account_id))}
+    else:
+        accounts = {
+            (item['platform'], storage_id_for(item['platform'], item['account_id']))
+            for item in integrations_db.iter_scan(attributes=['platform', 'account_id'])
+        }
+    return sorted(accounts | {(platform, day_rows_id(account)) for platform, account in accounts})
+
+
+def export(metrics_db, integrations_db, output, max_rows, page_size, only=None, full=False):
+    os.makedirs(output, exist_ok=True)
+    state = load_state(output)
+    last_exported = state["last_exported"]
+    accounts = accounts_to_export(integrations_db, only)
+    if full:
+        for _, account in accounts:
+            last_exported.pop(account, None)
+    writer = PartitionWriter(output, max_rows)
+    skipped = 0
+
+    def checkpoint():
+        last_exported.update(writer.flushed)
+        state["updated_at"] = datetime.datetime.utcnow().isoformat()
+        save_state(output, state)
+
+    for platform, account in accounts:
+        condition = 'account_id = :acc'
+        values = {':acc': account}
+        extra = {}
+        if account in last_exported:
+            condition += ' AND #ts > :after'
+            values[':after'] = last_exported[account]
+            extra = {'ExpressionAttributeNames': {'#ts': 'timestamp'}}
+        for item in metrics_db.iter_query(condition, values, page_size=page_size, **extra):
+            files_before = writer.files
+            try:
+                writer.add(item, platform)
+            except (KeyError, ValueError, TypeError) as e:
+                skipped += 1
+                print(f"Skipping malformed row {item.get('account_id')} @ {item.get('timestamp')}: {e}")
+            # Record progress as soon as rows are on disk, so a crash does not re-export them
+            if writer.files != files_before:
+                checkpoint()
+
+    writer.flush()
+    checkpoint()
+    print(f"Exported {writer.rows} rows in {writer.files} files to {output}"
+          + (f" ({skipped} malformed rows skipped)" if skipped else ""))
+    return writer.rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export metric history to partitioned Parquet files")
+    parser.add_argument("--output", default="exports/metrics")
+    parser.add_argument("--account", help="Only export one account, as platform/account_id")
+    parser.add_argument("--max-rows", type=int, default=100000, help="Rows buffered in memory before writing")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--full", action="store_true", help="Export everything again (remove the old files first)")
+    args = parser.parse_args()
+
+    if pa is None:
+        raise SystemExit("pyarrow is required for exports: pip install pyarrow")
+    export(DynamoDB('instagram_metrics'), DynamoDB('socials_integrations'), args.output,
+           args.max_rows, args.page_size, args.account, args.full)
@@ -0,0 +1,57 @@
+"""
+Fill the latest_metrics projection for accounts whose history predates it.
+
+GET /metrics/latest only reads latest_metrics, which every metric write
+keeps current. Accounts that have not been written since the projection
+was introduced (e.g. delta sync suppressed their unchanged snapshots) have
+no row yet; this reads each such account's newest snapshot once and
+records it. Accounts without any history are reported and left out.
+
+    python fill_latest_metrics.py
+    python fill_latest_metrics.py --dry-run
+"""
+import argparse
+from dotenv import load_dotenv
+from Db.database import DynamoDB
+from latest_metrics import LatestMetricsStore
+from sync_state import storage_id_for
+
+load_dotenv()
+
+
+def newest_snapshot(metrics_db, storage_id, legacy_id):
+    """Newest row of the account's partition, or of its legacy (unprefixed) one."""
+    items, _ = metrics_db.query_page('account_id = :acc', {':acc': storage_id}, 1, scan_forward=False)
+    if items:
+        return items[0]
+    items, _ = metrics_db.query_page('account_id = :acc', {':acc': legacy_id}, 1, scan_forward=False)
+    return dict(items[0], account_id=storage_id) if items else None
+
+
+def fill(metrics_db, integrations_db, latest_metrics, dry_run=False):
+    ids = {
+        storage_id_for(item['platform'], item['account_id']): item['account_id'].lower()
+        for item in integrations_db.iter_scan(attributes=['platform', 'account_id'])
+    }
+    missing = sorted(set(ids) - set(latest_metrics.get_many(list(ids))))
+    found = []
+    for storage_id in missing:
+        item = newest_snapshot(metrics_db, storage_id, ids[storage_id])
+        if item is None:
+            print(f"{storage_id}: no history yet")
+            continue
+        found.append(item)
+    if found and not dry_run:
+        latest_metrics.record_many(found)
+    print(f"{len(ids)} accounts, {len(missing)} without a latest row, "
+          f"{len(found)} {'would be filled' if dry_run else 'filled'}.")
+    return len(found)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill latest_metrics for accounts with older history")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the accounts that would be filled")
+    args = parser.parse_args()
+
+    fill(DynamoDB('instagram_metrics'), DynamoDB('socials_integrations'),
+         LatestMetricsStore(DynamoDB('latest_metrics')), args.dry_run)
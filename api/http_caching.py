@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+# Bodies above this are compressed off the event loop
+THREAD_MINIMUM_SIZE = 256 * 1024
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the values a response is derived from (e.g. latest snapshot time + query)."""
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True if an If-None-Match header matches `etag`. Compressed responses
+    carry the ETag with an encoding suffix ("abc-gzip"), which matches too.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == bare or candidate in (f"{bare}-gzip", f"{bare}-br"):
+            return True
+    return False
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding we can produce: br (with brotli installed), then gzip."""
+    accepted = {}
+    for entry in accept_encoding.lower().split(","):
+        name, _, params = entry.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for encoding in (("br",) if brotli else ()) + ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip compression of JSON/text responses of at least
+    `minimum_size` bytes, as negotiated by Accept-Encoding. Streaming and
+    already-encoded responses pass through. An ETag gets the encoding
+    appended, since the compressed bytes are a different representation.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            held, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=held["headers"])
+            content_type = headers.get("content-type", "")
+            if message.get("more_body") or "content-encoding" in headers or len(body) < self.minimum_size \
+                    or not content_type.startswith(COMPRESSIBLE_TYPES):
+                await send(held)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MINIMUM_SIZE:
+                compressed = await run_in_threadpool(self.compress, body, encoding)
+            else:
+                compressed = self.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and etag.endswith('"'):
+                headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            await send(held)
+            await send(dict(message, body=compressed))
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,176 @@
+import re
+import time
+import threading
+from typing import Dict, Tuple, List, Optional
+
+# Latency buckets in seconds, from fast DynamoDB reads up to slow upstream calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> ([count per bucket], sum, count)
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (bucket_counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    le = _labels(self.labelnames, labels, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {bucket_count}")
+                inf = _labels(self.labelnames, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Latency of upstream API requests",
+    ("platform", "endpoint")
+)
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total", "Upstream API requests by response status (or error type)",
+    ("platform", "endpoint", "status")
+)
+DYNAMODB_LATENCY = Histogram(
+    "dynamodb_request_duration_seconds", "Latency of DynamoDB calls",
+    ("table", "operation")
+)
+DYNAMODB_REQUESTS = Counter(
+    "dynamodb_requests_total", "DynamoDB calls by outcome",
+    ("table", "operation", "outcome")
+)
+SYNC_ACCOUNT_DURATION = Histogram(
+    "sync_account_duration_seconds", "Time to sync one account, including queueing for a platform slot",
+    ("platform", "status")
+)
+SYNC_ACCOUNTS = Counter(
+    "sync_accounts_total", "Accounts processed by sync runs, by outcome",
+    ("platform", "status")
+)
+SYNC_RUN_DURATION = Histogram(
+    "sync_run_duration_seconds", "Wall-clock time of whole sync executor runs",
+    (), buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200)
+)
+API_LATENCY = Histogram(
+    "api_request_duration_seconds", "Latency of this API's own endpoints",
+    ("method", "route", "status")
+)
+
+REGISTRY = (
+    UPSTREAM_LATENCY, UPSTREAM_REQUESTS, DYNAMODB_LATENCY, DYNAMODB_REQUESTS,
+    SYNC_ACCOUNT_DURATION, SYNC_ACCOUNTS, SYNC_RUN_DURATION, API_LATENCY
+)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Ids in upstream paths would make one series per account
+_ID_SEGMENT = re.compile(r"^(\d+|UC[\w-]{22}|[0-9a-f]{16,})$")
+_VERSION_SEGMENT = re.compile(r"^v\d+(\.\d+)?$")
+
+
+def endpoint_label(path: str) -> str:
+    """Low-cardinality endpoint name for an upstream URL path: /v19.0/1784/insights -> /{id}/insights."""
+    segments = []
+    for segment in path.strip("/").split("/"):
+        if not segment or _VERSION_SEGMENT.match(segment):
+            continue
+        segments.append("{id}" if _ID_SEGMENT.match(segment) else segment)
+    return "/" + "/".join(segments)
+
+
+def observe_upstream(platform: Optional[str], path: str, status: str, seconds: float):
+    endpoint = endpoint_label(path)
+    platform = platform or "other"
+    UPSTREAM_LATENCY.observe(seconds, platform, endpoint)
+    UPSTREAM_REQUESTS.inc(platform, endpoint, status)
+
+
+def instrument_dynamodb(client):
+    """Count and time every call a boto3 DynamoDB client makes, per table and operation."""
+    def tables_of(params) -> List[str]:
+        if params.get("TableName"):
+            return [params["TableName"]]
+        return list(params.get("RequestItems", {})) or ["-"]
+
+    # before-parameter-build sees the API parameters (TableName, RequestItems)
+    def before_call(params, model, context, **kwargs):
+        context["instrumentation"] = (time.monotonic(), tables_of(params), model.name)
+
+    def after_call(context, parsed=None, **kwargs):
+        started = context.pop("instrumentation", None)
+        if started is None:
+            return
+        elapsed = time.monotonic() - started[0]
+        outcome = parsed.get("Error", {}).get("Code", "ok") if isinstance(parsed, dict) else "ok"
+        for table in started[1]:
+            DYNAMODB_LATENCY.observe(elapsed, table, started[2])
+            DYNAMODB_REQUESTS.inc(table, started[2], outcome)
+
+    def after_call_error(context, exception=None, **kwargs):
+        started = context.pop("instrumentation", None)
+        if started is None:
+            return
+        for table in started[1]:
+            DYNAMODB_REQUESTS.inc(table, started[2], type(exception).__name__)
+
+    client.meta.events.register("before-parameter-build.dynamodb", before_call)
+    client.meta.events.register("after-call.dynamodb", after_call)
+    client.meta.events.register("after-call-error.dynamodb", after_call_error)
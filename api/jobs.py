@@ -0,0 +1,141 @@
+import time
+import uuid
+import logging
+import datetime
+from typing import Dict, Any, Optional
+from Db.database import DynamoDB
+
+logger = logging.getLogger("social_insights.jobs")
+
+# Finished jobs are dropped by DynamoDB TTL after a week
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+DEFAULT_LEASE_SECONDS = 900
+
+# GSI (status, created_at) so workers query runnable jobs instead of scanning the table
+STATUS_INDEX = {'name': 'status-created_at', 'pk': 'status', 'sk': 'created_at', 'attributes': ['lease_until']}
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat()
+
+
+class JobQueue:
+    """
+    Durable sync job queue on a DynamoDB table (pk `id`).
+
+    Jobs move queued -> running -> done/failed. A worker claims a job with a
+    conditional update and holds it for `lease_seconds`; every progress
+    update renews the lease, and if the worker dies the lease expires and
+    another worker picks the job up again.
+    """
+
+    def __init__(self, db: DynamoDB):
+        self.db = db
+
+    def create_table(self):
+        created = self.db.create_table(pk='id', indexes=[STATUS_INDEX])
+        if created:
+            try:
+                self.db.client.update_time_to_live(
+                    TableName=self.db.table_name,
+                    TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+                )
+            except Exception:
+                # Already enabled, or not supported by a local DynamoDB
+                pass
+        return created
+
+    def enqueue(self, job_type: str, payload: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        job_id = uuid.uuid4().hex
+        now = _now()
+        job = {
+            'id': job_id,
+            'type': job_type,
+            'status': 'queued',
+            'payload': payload or {},
+            'created_at': now,
+            'updated_at': now,
+            'total': 0,
+            'completed': 0,
+            'failed': 0,
+            'expires_at': int(time.time()) + JOB_RETENTION_SECONDS
+        }
+        if not self.db.save_item(job):
+            return None
+        logger.info(f"Enqueued {job_type} job {job_id}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.db.get_item({'id': job_id})
+
+    def claim(self, job_id: str, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Take a queued (or abandoned) job. Returns the job, or None if someone else has it."""
+        now = int(time.time())
+        return self.db.update_item(
+            {'id': job_id},
+            'SET #status = :running, worker_id = :worker, lease_until = :lease, lease_seconds = :lease_seconds, '
+            'started_at = if_not_exists(started_at, :started), updated_at = :started',
+            {
+                ':running': 'running',
+                ':queued': 'queued',
+                ':worker': worker_id,
+                ':lease': now + lease_seconds,
+                ':lease_seconds': lease_seconds,
+                ':now': now,
+                ':started': _now()
+            },
+            {'#status': 'status'},
+            '#status = :queued OR (#status = :running AND lease_until < :now)'
+        )
+
+    def claim_next(self, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Claim the oldest runnable job, if any."""
+        now = int(time.time())
+        candidates = list(self.db.iter_query(
+            '#status = :queued', {':queued': 'queued'},
+            IndexName=STATUS_INDEX['name'], ExpressionAttributeNames={'#status': 'status'}
+        ))
+        # Running jobs whose worker stopped renewing the lease
+        candidates += self.db.iter_query(
+            '#status = :running', {':running': 'running', ':now': now},
+            IndexName=STATUS_INDEX['name'], FilterExpression='lease_until < :now',
+            ExpressionAttributeNames={'#status': 'status'}
+        )
+        for job in sorted(candidates, key=lambda j: j.get('created_at', '')):
+            claimed = self.claim(job['id'], worker_id, lease_seconds)
+            if claimed:
+                return claimed
+        return None
+
+    def set_total(self, job_id: str, total: int):
+        self.db.update_item(
+            {'id': job_id}, 'SET #total = :total, updated_at = :now',
+            {':total': total, ':now': _now()}, {'#total': 'total'}
+        )
+
+    def record_progress(self, job_id: str, ok: bool):
+        """
+        Atomically count one finished account (safe from concurrent sync
+        threads) and renew the job's lease while it is making progress.
+        """
+        self.db.update_item(
+            {'id': job_id},
+            'ADD #counter :one SET updated_at = :now, lease_until = if_not_exists(lease_seconds, :lease_seconds) + :epoch',
+            {':one': 1, ':now': _now(), ':epoch': int(time.time()), ':lease_seconds': DEFAULT_LEASE_SECONDS},
+            {'#counter': 'completed' if ok else 'failed'}
+        )
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        self.db.update_item(
+            {'id': job_id}, 'SET #status = :done, #result = :result, finished_at = :now, updated_at = :now',
+            {':done': 'done', ':result': result, ':now': _now()},
+            {'#status': 'status', '#result': 'result'}
+        )
+
+    def fail(self, job_id: str, error: str):
+        self.db.update_item(
+            {'id': job_id}, 'SET #status = :failed, #error = :error, finished_at = :now, updated_at = :now',
+            {':failed': 'failed', ':error': error, ':now': _now()},
+            {'#status': 'status', '#error': 'error'}
+        )
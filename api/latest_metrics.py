@@ -0,0 +1,75 @@
+import os
+import logging
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from Db.database import DynamoDB
+
+logger = logging.getLogger("social_insights.latest_metrics")
+
+# Concurrent conditional puts per record_many call
+WRITE_CONCURRENCY = int(os.getenv("LATEST_WRITE_CONCURRENCY", 8))
+
+
+class LatestMetricsStore:
+    """
+    Copy of each account's newest metric snapshot (table `latest_metrics`,
+    pk `account_id` = storage id such as `instagram#123`), kept up to date on
+    every metric write so overview pages read one item per account with
+    BatchGetItem instead of querying history.
+
+    Backfilled daily rows are not snapshots (no follower totals) and are
+    left out. `history_updated_at` changes on every write to an account's
+    history, including older or backfilled rows, and versions it for ETags.
+    """
+
+    def __init__(self, db: DynamoDB):
+        self.db = db
+
+    def create_table(self):
+        return self.db.create_table(pk='account_id')
+
+    def record(self, item: Dict[str, Any]):
+        self.record_many([item])
+
+    def record_many(self, items: List[Dict[str, Any]]):
+        """Store each account's newest item of `items` unless a newer one is already stored."""
+        newest = {}
+        touched = set()
+        for item in items:
+            if not item.get('account_id') or not item.get('timestamp'):
+                continue
+            touched.add(item['account_id'])
+            if item.get('source') == 'backfill':
+                continue
+            current = newest.get(item['account_id'])
+            if current is None or item['timestamp'] >= current['timestamp']:
+                newest[item['account_id']] = item
+        now = datetime.datetime.utcnow().isoformat()
+
+        def write(item):
+            row = dict({key: value for key, value in item.items() if key != 'unchanged'}, history_updated_at=now)
+            # Never replace a newer snapshot stored by a concurrent writer
+            return self.db.save_item(
+                row, 'attribute_not_exists(account_id) OR #ts <= :ts',
+                {':ts': row['timestamp']}, {'#ts': 'timestamp'}
+            )
+
+        written = set()
+        if newest:
+            with ThreadPoolExecutor(max_workers=min(len(newest), WRITE_CONCURRENCY)) as pool:
+                written = {acc for acc, ok in zip(newest, pool.map(write, newest.values())) if ok}
+
+        # Accounts whose history changed below their latest snapshot only get a new version
+        for acc in touched - written:
+            self.db.update_item(
+                {'account_id': acc}, 'SET history_updated_at = :now', {':now': now},
+                condition_expression='attribute_exists(account_id)'
+            )
+
+    def get(self, storage_id: str) -> Optional[Dict[str, Any]]:
+        return self.db.get_item({'account_id': storage_id})
+
+    def get_many(self, storage_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """{storage_id: latest row} for the given accounts, in one BatchGetItem per 100 ids."""
+        return {row['account_id']: row for row in self.db.batch_get_items([{'account_id': acc} for acc in storage_ids])}
@@ -0,0 +1,112 @@
+import os
+import logging
+import datetime
+from typing import Dict, Any, Optional
+from Db.database import DynamoDB
+
+logger = logging.getLogger("social_insights.media_engagement")
+
+
+def _posted_at(timestamp: Optional[str]) -> Optional[str]:
+    """Graph media timestamp ("2024-05-01T12:00:00+0000") as a naive UTC ISO string."""
+    if not timestamp:
+        return None
+    try:
+        moment = datetime.datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return None
+    return moment.astimezone(datetime.timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class MediaEngagementStore:
+    """
+    Instagram interactions (likes + comments) summed over every post in the
+    last `window_days`, with per-media counts cached in DynamoDB (table
+    `instagram_media`, pk `account_id` = IG user id, sk `media_id`).
+
+    Each sync pages through media newest first but stops at the first
+    already-cached post older than `refresh_days`: counts of older posts
+    change little and are taken from the cache. Once cached counts inside
+    the window are older than `full_refresh_hours`, the whole window is
+    walked again. Cached posts that the walk passed over without seeing
+    them have been deleted and are dropped from the cache.
+    """
+
+    def __init__(self, db: DynamoDB, window_days: Optional[int] = None, refresh_days: Optional[int] = None,
+                 full_refresh_hours: Optional[int] = None, max_pages: Optional[int] = None):
+        self.db = db
+        self.window_days = window_days or int(os.getenv("MEDIA_WINDOW_DAYS", 90))
+        self.refresh_days = refresh_days or int(os.getenv("MEDIA_REFRESH_DAYS", 7))
+        self.full_refresh_hours = full_refresh_hours or int(os.getenv("MEDIA_FULL_REFRESH_HOURS", 168))
+        self.max_pages = max_pages or int(os.getenv("MEDIA_MAX_PAGES", 20))
+
+    def create_table(self):
+        return self.db.create_table(pk='account_id', sk='media_id', sk_type='S')
+
+    def total_interactions(self, client, ig_user_id: str, first_page: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Interactions over the window for `ig_user_id`, refreshing recent
+        posts through `client` (an InstagramClient). `first_page` is a media
+        response already fetched by a Graph batch.
+        """
+        now = datetime.datetime.utcnow()
+        window_start = (now - datetime.timedelta(days=self.window_days)).isoformat()
+        refresh_start = (now - datetime.timedelta(days=self.refresh_days)).isoformat()
+        stale_before = (now - datetime.timedelta(hours=self.full_refresh_hours)).isoformat()
+
+        cached = {
+            media['media_id']: media
+            for media in self.db.iter_query('account_id = :acc', {':acc': ig_user_id})
+        }
+        full_refresh = not cached or any(
+            media['fetched_at'] < stale_before for media in cached.values() if media['posted_at'] >= window_start
+        )
+
+        fetched_at = now.isoformat()
+        fresh = {}
+        # Media come newest first, so the walk saw every post newer than this
+        walked_to = None
+        try:
+            for media in client.iter_media(ig_user_id, first_page=first_page, max_pages=self.max_pages):
+                posted_at = _posted_at(media.get('timestamp'))
+                if posted_at is None:
+                    continue
+                walked_to = posted_at
+                if posted_at < window_start:
+                    break
+                if not full_refresh and posted_at < refresh_start and media['id'] in cached:
+                    break
+                fresh[media['id']] = {
+                    'account_id': ig_user_id,
+                    'media_id': media['id'],
+                    'posted_at': posted_at,
+                    'like_count': media.get('like_count', 0),
+                    'comments_count': media.get('comments_count', 0),
+                    'fetched_at': fetched_at
+                }
+        except Exception as e:
+            # Keep what was fetched so far; the cache covers the rest
+            logger.warning(f"Media paging stopped early for {ig_user_id}: {e}")
+
+        # Posts that left the window, and posts the walk passed over (deleted since)
+        dropped = {
+            media_id for media_id, media in cached.items()
+            if media['posted_at'] < window_start
+            or (walked_to is not None and media['posted_at'] > walked_to and media_id not in fresh)
+        }
+        merged = {media_id: media for media_id, media in dict(cached, **fresh).items() if media_id not in dropped}
+        with self.db.batch_writer() as writer:
+            for media in fresh.values():
+                writer.put(media)
+            for media_id in dropped:
+                writer.delete({'account_id': ig_user_id, 'media_id': media_id})
+
+        total = sum(
+            int(media.get('like_count', 0)) + int(media.get('comments_count', 0))
+            for media in merged.values() if media['posted_at'] >= window_start
+        )
+        logger.info(
+            f"Interactions for {ig_user_id}: {total} over {self.window_days} days "
+            f"({len(fresh)} media refreshed, {len(merged) - len(fresh)} from cache, {len(dropped)} dropped)"
+        )
+        return total
@@ -0,0 +1,189 @@
+"""
+Backfill legacy metric rows onto the composite `platform#account_id` key.
+
+Early syncs stored Instagram snapshots under the bare account id, which is
+why GET /metrics/{platform}/{account_id} still falls back to a second query.
+This tool copies those rows to their prefixed partition in batches,
+checkpointing the scan position after every page so an interrupted run
+resumes where it stopped. Re-running is safe: copies overwrite the same key.
+Once every row is copied, the rollups of each migrated account are rebuilt
+from its full history.
+
+    python migrate_metrics.py               # copy legacy rows
+    python migrate_metrics.py --verify      # check every legacy row has a copy
+    python migrate_metrics.py --delete-legacy
+
+--delete-legacy finishes the copy if needed, then scans the legacy rows
+again and deletes only those whose prefixed copy exists; rows without one
+are reported and kept.
+
+Once --verify reports no missing rows, set METRICS_LEGACY_FALLBACK=false to
+drop the fallback query from the API.
+"""
+import os
+import json
+import argparse
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from Db.database import DynamoDB, encode_cursor, decode_cursor
+from latest_metrics import LatestMetricsStore
+from rollups import RollupStore
+from sync_state import storage_id_for
+from backfill import day_rows_id
+
+load_dotenv()
+
+DEFAULT_CHECKPOINT = ".metrics_migration_checkpoint.json"
+
+
+def legacy_filter():
+    """Legacy rows are the ones whose partition key has no platform prefix."""
+    return {
+        'FilterExpression': 'NOT contains(account_id, :sep)',
+        'ExpressionAttributeValues': {':sep': '#'}
+    }
+
+
+def composite_id(item):
+    return storage_id_for(item.get('platform', 'instagram'), item['account_id'])
+
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_key": None, "migrated": 0, "accounts": [], "done": False}
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def iter_legacy_pages(metrics_db, page_size, start_key=None):
+    """Yield (legacy_items, last_key) per scanned page."""
+    last_key = start_key
+    while True:
+        items, last_key = metrics_db.scan_page(page_size, last_key, **legacy_filter())
+        yield items, last_key
+        if not last_key:
+            return
+
+
+def rebuild_rollups(metrics_db, rollups, accounts):
+    """Recompute the rollups of migrated accounts from their snapshots and backfilled day rows."""
+    for account in accounts:
+        rows = list(metrics_db.iter_query('account_id = :acc', {':acc': account}, page_size=1000))
+        day_rows = metrics_db.iter_query('account_id = :acc', {':acc': day_rows_id(account)}, page_size=1000)
+        rollups.rebuild(account, rows + [dict(row, account_id=account) for row in day_rows])
+        print(f"Rebuilt rollups of {account} from {len(rows)} snapshots")
+
+
+def migrate(metrics_db, checkpoint_path, page_size, latest=None, rollups=None):
+    checkpoint = load_checkpoint(checkpoint_path)
+    checkpoint.setdefault("accounts", [])
+    if checkpoint["done"]:
+        print(f"Migration already complete ({checkpoint['migrated']} rows). Delete {checkpoint_path} to run again.")
+        return checkpoint
+
+    start_key = decode_cursor(checkpoint["last_key"]) if checkpoint["last_key"] else None
+    if start_key:
+        print(f"Resuming after {checkpoint['migrated']} legacy rows...")
+
+    try:
+        for items, last_key in iter_legacy_pages(metrics_db, page_size, start_key):
+            copies = []
+            with metrics_db.batch_writer() as writer:
+                for item in items:
+                    migrated = dict(item)
+                    migrated['account_id'] = composite_id(item)
+                    migrated.setdefault('platform', 'instagram')
+                    writer.put(migrated)
+                    copies.append(migrated)
+            if writer.failed:
+                print(f"{writer.failed} writes failed; stopping so the page is retried on the next run.")
+                return checkpoint
+            if latest is not None:
+                # New rows in the prefixed partitions; keeps latest snapshots and ETags current
+                latest.record_many(copies)
+
+            checkpoint["migrated"] += len(items)
+            checkpoint["accounts"] = sorted(set(checkpoint["accounts"]) | {copy['account_id'] for copy in copies})
+            checkpoint["last_key"] = encode_cursor(last_key)
+            save_checkpoint(checkpoint_path, checkpoint)
+            print(f"Migrated {checkpoint['migrated']} legacy rows so far...")
+    except ClientError as e:
+        print(f"Scan failed: {e}. Re-run to resume from the last checkpoint.")
+        return checkpoint
+
+    if rollups is not None:
+        # The copies predate what the rollups of their partitions were built from
+        rebuild_rollups(metrics_db, rollups, checkpoint["accounts"])
+    checkpoint["done"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    print(f"Migration complete: {checkpoint['migrated']} legacy rows copied.")
+    return checkpoint
+
+
+def delete_legacy(metrics_db, page_size):
+    """
+    Delete legacy rows whose prefixed copy exists (checked per page with
+    BatchGetItem). Returns the number of legacy rows kept because their copy
+    is missing or a delete failed.
+    """
+    deleted = 0
+    kept = 0
+    for items, _ in iter_legacy_pages(metrics_db, page_size):
+        keys = [{'account_id': composite_id(item), 'timestamp': item['timestamp']} for item in items]
+        copied = {
+            (row['account_id'], row['timestamp'])
+            for row in metrics_db.batch_get_items(keys, attributes=['account_id', 'timestamp'])
+        }
+        with metrics_db.batch_writer() as writer:
+            for item, key in zip(items, keys):
+                if (key['account_id'], key['timestamp']) in copied:
+                    writer.delete({'account_id': item['account_id'], 'timestamp': item['timestamp']})
+                else:
+                    kept += 1
+                    print(f"Keeping {item['account_id']} @ {item['timestamp']}: no copy under {key['account_id']}")
+        deleted += writer.written
+        kept += writer.failed
+    print(f"Deleted {deleted} legacy rows, kept {kept}.")
+    return kept
+
+
+def verify(metrics_db, page_size):
+    """Count legacy rows without a prefixed copy. Returns the number missing."""
+    checked = 0
+    missing = 0
+    for items, _ in iter_legacy_pages(metrics_db, page_size):
+        for item in items:
+            checked += 1
+            if not metrics_db.get_item({'account_id': composite_id(item), 'timestamp': item['timestamp']}):
+                missing += 1
+                print(f"Missing copy for {item['account_id']} @ {item['timestamp']}")
+    print(f"Checked {checked} legacy rows, {missing} missing.")
+    if missing == 0:
+        print("Verified. It is safe to set METRICS_LEGACY_FALLBACK=false.")
+    return missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move legacy metric rows to platform-prefixed keys")
+    parser.add_argument("--verify", action="store_true", help="Only check that every legacy row was copied")
+    parser.add_argument("--delete-legacy", action="store_true", help="Delete legacy rows that have a copy")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    args = parser.parse_args()
+
+    metrics_db = DynamoDB('instagram_metrics')
+    if args.verify:
+        raise SystemExit(1 if verify(metrics_db, args.page_size) else 0)
+    checkpoint = migrate(metrics_db, args.checkpoint, args.page_size,
+                         LatestMetricsStore(DynamoDB('latest_metrics')), RollupStore(DynamoDB('metric_rollups')))
+    if args.delete_legacy:
+        if not checkpoint["done"]:
+            raise SystemExit("Not deleting legacy rows before the copy has completed.")
+        raise SystemExit(1 if delete_legacy(metrics_db, args.page_size) else 0)
@@ -0,0 +1,105 @@
+"""
+Recompute followers_new over stored history for platforms that do not
+report it (sync_state.DERIVED_DELTAS: Instagram, Pinterest).
+
+Live syncs derive followers_new as the net change of followers_total since
+the last snapshot of an earlier day. This applies the same rule to rows
+written before that existed: every account's rows are read oldest first,
+rows whose derived values differ are rewritten in batches, the account's
+rollups and latest snapshot are refreshed and its sync state gets the
+matching baseline.
+
+    python recompute_followers_new.py                    # every Instagram/Pinterest integration
+    python recompute_followers_new.py --account instagram/1784...
+    python recompute_followers_new.py --dry-run
+"""
+import argparse
+from dotenv import load_dotenv
+from Db.database import DynamoDB
+from rollups import RollupStore
+from latest_metrics import LatestMetricsStore
+from sync_state import DERIVED_DELTAS, storage_id_for
+from backfill import day_rows_id
+
+load_dotenv()
+
+
+def recompute_rows(platform, rows):
+    """Rows (oldest first) whose derived fields change, with the new values applied, plus the final baseline."""
+    deltas = DERIVED_DELTAS[platform]
+    changed = []
+    day, day_values, baseline = None, None, None
+    for row in rows:
+        # Backfilled day rows carry no snapshot totals
+        if any(row.get(source) is None for source in deltas.values()):
+            continue
+        row_day = row['timestamp'][:10]
+        if row_day != day:
+            if day_values is not None:
+                baseline = {'day': day, 'values': day_values}
+            day = row_day
+        day_values = {source: row[source] for source in deltas.values()}
+        if baseline is None:
+            continue
+        updated = {field: int(row[source]) - int(baseline['values'][source]) for field, source in deltas.items()}
+        if any(row.get(field) is None or int(row[field]) != value for field, value in updated.items()):
+            row.update(updated)
+            changed.append(row)
+    return changed, baseline
+
+
+def day_rows(metrics_db, account):
+    """The account's backfilled day rows, which its rollups also include."""
+    return list(metrics_db.iter_query('account_id = :acc', {':acc': day_rows_id(account)}, page_size=1000))
+
+
+def recompute_account(metrics_db, rollups, latest_metrics, state_db, platform, account, dry_run=False):
+    rows = list(metrics_db.iter_query('account_id = :acc', {':acc': account}, page_size=1000))
+    changed, baseline = recompute_rows(platform, rows)
+    if dry_run or not changed:
+        return len(changed)
+
+    with metrics_db.batch_writer() as writer:
+        for row in changed:
+            writer.put(row)
+    if writer.failed:
+        print(f"{account}: {writer.failed} of {len(changed)} writes failed; re-run to retry")
+    rollups.rebuild(account, rows + [dict(row, account_id=account) for row in day_rows(metrics_db, account)])
+    latest_metrics.record_many(changed)
+    if baseline is not None:
+        state_db.update_item(
+            {'account_id': account}, 'SET baseline = :baseline', {':baseline': baseline},
+            condition_expression='attribute_exists(account_id)'
+        )
+    return len(changed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute followers_new from stored followers_total history")
+    parser.add_argument("--account", help="Only one account, as platform/account_id")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would change")
+    args = parser.parse_args()
+
+    metrics_db = DynamoDB('instagram_metrics')
+    rollups = RollupStore(DynamoDB('metric_rollups'))
+    latest_metrics = LatestMetricsStore(DynamoDB('latest_metrics'))
+    state_db = DynamoDB('sync_state')
+    if args.account:
+        platform, account_id = args.account.split("/", 1)
+        accounts = [(platform, storage_id_for(platform, account_id))]
+    else:
+        accounts = sorted({
+            (item['platform'], storage_id_for(item['platform'], item['account_id']))
+            for item in DynamoDB('socials_integrations').iter_scan(attributes=['platform', 'account_id'])
+            if item['platform'] in DERIVED_DELTAS
+        })
+
+    total = 0
+    for platform, account in accounts:
+        if platform not in DERIVED_DELTAS:
+            print(f"Skipping {account}: {platform} reports followers_new itself")
+            continue
+        count = recompute_account(metrics_db, rollups, latest_metrics, state_db, platform, account, args.dry_run)
+        total += count
+        print(f"{account}: {count} rows {'would change' if args.dry_run else 'updated'}")
+    print(f"Done: {total} rows {'would change' if args.dry_run else 'updated'} across {len(accounts)} accounts.")
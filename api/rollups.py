@@ -0,0 +1,199 @@
+import os
+import copy
+import time
+import random
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from Db.database import DynamoDB
+
+logger = logging.getLogger("social_insights.rollups")
+
+GRANULARITIES = ("daily", "weekly", "monthly")
+
+# Concurrent conditional writes per record_many call
+WRITE_CONCURRENCY = int(os.getenv("ROLLUP_WRITE_CONCURRENCY", 8))
+# Re-reads of a bucket that another writer changed before giving up on it
+MAX_WRITE_ATTEMPTS = 8
+RETRY_BASE_DELAY = 0.02
+
+# Numeric fields of a metric row that get aggregated
+METRIC_FIELDS = (
+    "followers_total",
+    "followers_new",
+    "views_organic",
+    "views_ads",
+    "interactions",
+    "profile_visits",
+    "accounts_reached",
+    "saves"
+)
+
+
+def bucket_for(timestamp: str, granularity: str) -> str:
+    """Bucket key for an ISO timestamp: 2024-01-07, 2024-W01 or 2024-01."""
+    moment = datetime.datetime.fromisoformat(timestamp)
+    if granularity == "daily":
+        return moment.strftime("%Y-%m-%d")
+    if granularity == "weekly":
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    if granularity == "monthly":
+        return moment.strftime("%Y-%m")
+    raise ValueError(f"Unknown granularity '{granularity}'")
+
+
+class RollupStore:
+    """
+    Pre-aggregated daily/weekly/monthly buckets of the raw metric snapshots.
+
+    One row per series (`<platform>#<account_id>#<granularity>`) and bucket,
+    holding for each metric field the first, last, max and sum of the values
+    seen in that bucket plus delta = last - first. Rows are updated
+    incrementally as snapshots are written, so charts over long ranges read
+    one row per bucket instead of every snapshot. Backfilled day rows add to
+    sum and max but only provide first/last in buckets without snapshots.
+
+    Rows carry a `version`; every write is conditional on the version that
+    was read, so concurrent writers (a full sync and a direct save, or two
+    processes) re-read and merge instead of overwriting each other.
+    """
+
+    def __init__(self, db: DynamoDB):
+        self.db = db
+
+    def create_table(self):
+        return self.db.create_table(pk='series', sk='bucket', sk_type='S')
+
+    def record(self, item: Dict[str, Any]):
+        self.record_many([item])
+
+    def record_many(self, items: List[Dict[str, Any]]):
+        """Fold metric rows into their buckets (one read and one write per touched bucket)."""
+        groups = {}
+        for item in items:
+            if not item.get('account_id') or not item.get('timestamp'):
+                continue
+            for granularity in GRANULARITIES:
+                try:
+                    bucket = bucket_for(item['timestamp'], granularity)
+                except ValueError:
+                    logger.warning(f"Skipping rollup for unparseable timestamp {item['timestamp']}")
+                    break
+                key = (f"{item['account_id']}#{granularity}", bucket)
+                groups.setdefault(key, {"granularity": granularity, "items": []})["items"].append(item)
+
+        if not groups:
+            return
+
+        keys = [{'series': series, 'bucket': bucket} for series, bucket in groups]
+        existing = {(row['series'], row['bucket']): row for row in self.db.batch_get_items(keys)}
+
+        def write(entry):
+            (series, bucket), group = entry
+            row = existing.get((series, bucket))
+            for attempt in range(MAX_WRITE_ATTEMPTS):
+                if self._put_merged(series, bucket, row, group):
+                    return True
+                # Changed by another writer since it was read; merge into the current version
+                time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * (0.5 + random.random()))
+                row = self.db.get_item({'series': series, 'bucket': bucket})
+            return False
+
+        with ThreadPoolExecutor(max_workers=min(len(groups), WRITE_CONCURRENCY)) as pool:
+            failed = list(pool.map(write, groups.items())).count(False)
+        if failed:
+            logger.error(f"Failed to write {failed} of {len(groups)} rollup rows")
+
+    def _put_merged(self, series: str, bucket: str, row: Optional[Dict[str, Any]], group: Dict[str, Any]) -> bool:
+        """Write `row` with the group's items folded in, unless the stored bucket is no longer `row`."""
+        merged = copy.deepcopy(row) if row else {
+            'series': series,
+            'bucket': bucket,
+            'account_id': group["items"][0]['account_id'],
+            'granularity': group["granularity"],
+            'count': 0,
+            'snapshots': 0,
+            'metrics': {}
+        }
+        for item in sorted(group["items"], key=lambda i: i['timestamp']):
+            self._merge(merged, item)
+
+        if row is None:
+            merged['version'] = 1
+            return self.db.save_item(merged, 'attribute_not_exists(series)')
+        merged['version'] = int(row['version']) + 1
+        return self.db.save_item(merged, '#version = :expected', {':expected': row['version']}, {'#version': 'version'})
+
+    @staticmethod
+    def _merge(row: Dict[str, Any], item: Dict[str, Any]):
+        timestamp = item['timestamp']
+        snapshot = item.get('source') != 'backfill'
+        snapshots = int(row['snapshots'])
+        if snapshot and not snapshots:
+            # The first snapshot replaces first/last taken from backfilled day rows
+            is_first = is_last = True
+        elif not snapshot and snapshots:
+            is_first = is_last = False
+        else:
+            is_first = 'first_timestamp' not in row or timestamp <= row['first_timestamp']
+            is_last = 'last_timestamp' not in row or timestamp >= row['last_timestamp']
+
+        for field in METRIC_FIELDS:
+            if item.get(field) is None:
+                continue
+            value = int(item[field])
+            agg = row['metrics'].get(field)
+            if agg is None:
+                agg = {'first': value, 'last': value, 'max': value, 'sum': 0}
+                row['metrics'][field] = agg
+            agg['sum'] = int(agg['sum']) + value
+            agg['max'] = max(int(agg['max']), value)
+            if is_first:
+                agg['first'] = value
+            if is_last:
+                agg['last'] = value
+            agg['delta'] = int(agg['last']) - int(agg['first'])
+
+        row['count'] = int(row['count']) + 1
+        row['snapshots'] = snapshots + snapshot
+        if is_first:
+            row['first_timestamp'] = timestamp
+        if is_last:
+            row['last_timestamp'] = timestamp
+
+    def query(self, storage_id: str, granularity: str, start: Optional[str] = None,
+              end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Buckets of one series, oldest first. `start`/`end` are ISO dates or
+        timestamps and select every bucket they fall into or between.
+        Raises ValueError for unparseable bounds or granularities.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}'")
+        start = bucket_for(start, granularity) if start else None
+        end = bucket_for(end, granularity) if end else None
+        series = f"{storage_id}#{granularity}"
+        condition = 'series = :series'
+        values = {':series': series}
+        if start and end:
+            condition += ' AND #bucket BETWEEN :from AND :to'
+            values.update({':from': start, ':to': end})
+        elif start:
+            condition += ' AND #bucket >= :from'
+            values[':from'] = start
+        elif end:
+            condition += ' AND #bucket <= :to'
+            values[':to'] = end
+        extra = {'ExpressionAttributeNames': {'#bucket': 'bucket'}} if len(values) > 1 else {}
+        return self.db.query_items(condition, values, **extra)
+
+    def rebuild(self, storage_id: str, items: List[Dict[str, Any]]):
+        """Replace every bucket of an account with aggregates of `items` (after rewriting history)."""
+        with self.db.batch_writer() as writer:
+            for granularity in GRANULARITIES:
+                series = f"{storage_id}#{granularity}"
+                for row in self.db.iter_query('series = :series', {':series': series}, attributes=['series', 'bucket']):
+                    writer.delete({'series': row['series'], 'bucket': row['bucket']})
+        self.record_many(items)
@@ -0,0 +1,181 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Optional
+from Sources import resilience
+import instrumentation
+
+logger = logging.getLogger("social_insights.sync")
+
+# 'meta' is the legacy platform name for Facebook Pages
+PLATFORM_ALIASES = {"meta": "facebook"}
+
+DEFAULT_PLATFORM_LIMITS = {
+    "instagram": 4,
+    "facebook": 4,
+    "pinterest": 2,
+    "youtube": 2
+}
+
+
+def parse_platform_limits(raw: Optional[str]) -> Dict[str, int]:
+    """
+    Parse per-platform caps from a string like "instagram=4,youtube=2".
+    Unknown or malformed entries are ignored.
+    """
+    limits = dict(DEFAULT_PLATFORM_LIMITS)
+    if not raw:
+        return limits
+    for entry in raw.split(","):
+        if "=" not in entry:
+            continue
+        name, value = entry.split("=", 1)
+        try:
+            limits[name.strip().lower()] = max(1, int(value))
+        except ValueError:
+            logger.warning(f"Ignoring invalid platform concurrency entry: {entry}")
+    return limits
+
+
+class SyncExecutor:
+    """
+    Fans out per-account syncs over a thread pool.
+
+    `handlers` maps a platform name to a callable `(account_id, access_token)`
+    returning the saved metric item, or None on failure (the contract of the
+    sync_* functions in index.py). Concurrency is capped globally by the pool
+    size and per platform by `platform_limits`: accounts wait in per-platform
+    queues and are only handed to the pool while their platform has a free
+    slot, so a run of accounts from one capped platform never ties up workers
+    that another platform could use, nor bursts past its API limits.
+
+    `deadline` (a time.monotonic() value) bounds the whole run: upstream calls
+    made by handlers are cut short when it passes, and accounts that have not
+    started by then are skipped.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[..., Optional[Dict[str, Any]]]],
+                 max_workers: int = None, platform_limits: Dict[str, int] = None,
+                 deadline: Optional[float] = None):
+        self.handlers = handlers
+        self.deadline = deadline
+        self.max_workers = max_workers or int(os.getenv("SYNC_MAX_CONCURRENCY", 8))
+        if platform_limits is None:
+            platform_limits = parse_platform_limits(os.getenv("SYNC_PLATFORM_CONCURRENCY"))
+        self.platform_limits = platform_limits
+
+    @staticmethod
+    def _platform(account: Dict[str, Any]) -> Optional[str]:
+        return PLATFORM_ALIASES.get(account.get("platform"), account.get("platform"))
+
+    def _run_one(self, account: Dict[str, Any]) -> Dict[str, Any]:
+        platform = self._platform(account)
+        account_id = account.get("account_id")
+        result = {"platform": platform, "account_id": account_id}
+
+        handler = self.handlers.get(platform)
+        if handler is None:
+            result["status"] = "skipped"
+            result["error"] = f"No sync handler for platform '{platform}'"
+            instrumentation.SYNC_ACCOUNTS.inc(str(platform), result["status"])
+            return result
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            result["status"] = "skipped"
+            result["error"] = "Sync deadline exceeded before this account started"
+            result["duration_ms"] = 0
+            instrumentation.SYNC_ACCOUNTS.inc(platform, result["status"])
+            return result
+
+        start = time.monotonic()
+        try:
+            with resilience.deadline(self.deadline):
+                item = handler(account_id, account.get("access_token"))
+            if item is None:
+                result["status"] = "failed"
+                result["error"] = "Sync returned no data"
+            else:
+                result["status"] = "ok"
+                result["item"] = item
+        except Exception as e:
+            logger.error(f"Background sync failed for {account_id}: {e}")
+            result["status"] = "failed"
+            result["error"] = str(e)
+        result["duration_ms"] = int((time.monotonic() - start) * 1000)
+        instrumentation.SYNC_ACCOUNT_DURATION.observe(time.monotonic() - start, platform, result["status"])
+        instrumentation.SYNC_ACCOUNTS.inc(platform, result["status"])
+        return result
+
+    def run(self, accounts: List[Dict[str, Any]],
+            on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Sync all accounts and return a summary:
+        {total, succeeded, failed, skipped, duration_ms, results: [...]}
+        Results keep the order of `accounts`. `on_result` is called with each
+        account's result as soon as it finishes (from a worker thread).
+        """
+        start = time.monotonic()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(accounts)
+        # Account positions waiting per platform, in order
+        queues: Dict[Optional[str], deque] = {}
+        for index, account in enumerate(accounts):
+            queues.setdefault(self._platform(account), deque()).append(index)
+        running = {platform: 0 for platform in queues}
+        workers = max(1, min(self.max_workers, len(accounts)))
+        changed = threading.Condition()
+        state = {"in_flight": 0, "done": 0}
+
+        def run_and_report(index, platform):
+            try:
+                result = results[index] = self._run_one(accounts[index])
+                if on_result:
+                    try:
+                        on_result(result)
+                    except Exception as e:
+                        logger.warning(f"Sync progress callback failed: {e}")
+            finally:
+                with changed:
+                    running[platform] -= 1
+                    state["in_flight"] -= 1
+                    state["done"] += 1
+                    changed.notify()
+
+        def next_ready():
+            """Earliest waiting account whose platform has a free slot, or None."""
+            ready = [
+                (queue[0], platform) for platform, queue in queues.items()
+                if queue and running[platform] < self.platform_limits.get(platform, workers)
+            ]
+            return min(ready, key=lambda entry: entry[0]) if ready else None
+
+        if accounts:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync") as pool:
+                with changed:
+                    while state["done"] < len(accounts):
+                        entry = next_ready() if state["in_flight"] < workers else None
+                        if entry is None:
+                            changed.wait()
+                            continue
+                        index, platform = entry
+                        queues[platform].popleft()
+                        running[platform] += 1
+                        state["in_flight"] += 1
+                        pool.submit(run_and_report, index, platform)
+
+        summary = {
+            "total": len(results),
+            "succeeded": sum(1 for r in results if r["status"] == "ok"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "skipped": sum(1 for r in results if r["status"] == "skipped"),
+            "duration_ms": int((time.monotonic() - start) * 1000),
+            "results": results
+        }
+        instrumentation.SYNC_RUN_DURATION.observe(time.monotonic() - start)
+        logger.info(
+            f"Sync executor finished {summary['total']} accounts in {summary['duration_ms']}ms "
+            f"({summary['succeeded']} ok, {summary['failed']} failed, {summary['skipped']} skipped)"
+        )
+        return summary
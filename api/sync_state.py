@@ -0,0 +1,171 @@
+import datetime
+import threading
+import logging
+from typing import Dict, Any, List, Optional
+from Db.database import DynamoDB
+from rollups import METRIC_FIELDS
+
+logger = logging.getLogger("social_insights.sync_state")
+
+# Fields a platform does not report, derived from the change of another
+# field since the last snapshot of an earlier day
+DERIVED_DELTAS = {
+    'instagram': {'followers_new': 'followers_total'},
+    'pinterest': {'followers_new': 'followers_total'}
+}
+
+
+def storage_id_for(platform: str, account_id: str) -> str:
+    """Partition key of an account's metric rows (and of its sync state)"""
+    if platform == 'meta':
+        platform = 'facebook'
+    # YouTube channel ids are case-sensitive and stored as-is
+    if platform == 'youtube':
+        return f"youtube#{account_id}"
+    return f"{platform}#{account_id.lower()}"
+
+
+def valid_until_from_end_time(end_time: Optional[str]) -> Optional[str]:
+    """
+    A Graph `period=day` insight value ending at `end_time` is only replaced
+    once the next daily period closes, one day later.
+    """
+    if not end_time:
+        return None
+    try:
+        moment = datetime.datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return None
+    moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (moment + datetime.timedelta(days=1)).isoformat()
+
+
+def next_utc_midnight() -> str:
+    """For daily reports that only gain a new row once the UTC day changes."""
+    tomorrow = datetime.datetime.utcnow().date() + datetime.timedelta(days=1)
+    return datetime.datetime.combine(tomorrow, datetime.time()).isoformat()
+
+
+class SyncStateStore:
+    """
+    Per-account delta-sync bookkeeping (table `sync_state`, pk `account_id`
+    = storage id such as `instagram#123`):
+
+    - `values`: metric fields of the last snapshot written, to suppress
+      writes of identical snapshots
+    - `insights` / `insights_valid_until`: the last fetched insight values
+      and when their period rolls over, to skip insight calls until then
+    - `baseline`: {day, values} of the last snapshot written before the
+      current day, for day-over-day deltas (DERIVED_DELTAS)
+    """
+
+    def __init__(self, db: DynamoDB):
+        self.db = db
+
+    def create_table(self):
+        return self.db.create_table(pk='account_id')
+
+    def get(self, storage_id: str) -> Optional[Dict[str, Any]]:
+        return self.db.get_item({'account_id': storage_id})
+
+    def save(self, state: Dict[str, Any]) -> bool:
+        return self.db.save_item(state)
+
+    @staticmethod
+    def insights_current(state: Optional[Dict[str, Any]]) -> bool:
+        """True while the stored insight values are still the latest period's."""
+        if not state or not state.get('insights') or not state.get('insights_valid_until'):
+            return False
+        return datetime.datetime.utcnow().isoformat() < state['insights_valid_until']
+
+    @staticmethod
+    def unchanged(state: Optional[Dict[str, Any]], item: Dict[str, Any]) -> bool:
+        """True if `item` has the same metric values as the last written snapshot."""
+        if not state or 'values' not in state:
+            return False
+        values = state['values']
+        for field in METRIC_FIELDS:
+            if field not in item and field not in values:
+                continue
+            if field not in item or field not in values or int(item[field]) != int(values[field]):
+                return False
+        return True
+
+    @staticmethod
+    def baseline_for(state: Optional[Dict[str, Any]], day: str) -> Optional[Dict[str, Any]]:
+        """{day, values} of the last snapshot written before `day` (YYYY-MM-DD), if known."""
+        if not state:
+            return None
+        if state.get('values') and state.get('updated_at', '')[:10] < day:
+            return {'day': state['updated_at'][:10], 'values': state['values']}
+        baseline = state.get('baseline')
+        if baseline and baseline.get('day', '') < day:
+            return baseline
+        return None
+
+    @staticmethod
+    def derive_deltas(platform: str, item: Dict[str, Any], state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Fill the DERIVED_DELTAS fields of `item` (e.g. followers_new as the
+        net change of followers_total since the previous day's last snapshot).
+        Returns the baseline used, to keep in the state, or None.
+        """
+        deltas = DERIVED_DELTAS.get(platform)
+        baseline = SyncStateStore.baseline_for(state, item['timestamp'][:10]) if deltas else None
+        if baseline is None:
+            return None
+        values = baseline['values']
+        for field, source in deltas.items():
+            if item.get(source) is not None and values.get(source) is not None:
+                item[field] = int(item[source]) - int(values[source])
+        return {'day': baseline['day'], 'values': {source: values[source] for source in deltas.values() if source in values}}
+
+
+class SyncRun:
+    """
+    Sync state as seen by one full sync: every account's state is fetched
+    up front with BatchGetItem, and states describing rows that are only
+    buffered on the run's batch writer are held until it has flushed.
+    Same get/save interface as SyncStateStore, so one run never sees or
+    writes another overlapping run's states.
+    """
+
+    def __init__(self, store: SyncStateStore, storage_ids: List[str]):
+        self.store = store
+        states = store.db.batch_get_items([{'account_id': storage_id} for storage_id in storage_ids])
+        self._preloaded: Dict[str, Optional[Dict[str, Any]]] = {state['account_id']: state for state in states}
+        # Accounts without state yet are known-empty; no need to look them up again
+        for storage_id in storage_ids:
+            self._preloaded.setdefault(storage_id, None)
+        self._deferred: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, storage_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if storage_id in self._preloaded:
+                return self._preloaded[storage_id]
+        return self.store.get(storage_id)
+
+    def save(self, state: Dict[str, Any]) -> bool:
+        if not self.store.save(state):
+            return False
+        with self._lock:
+            if state['account_id'] in self._preloaded:
+                self._preloaded[state['account_id']] = state
+        return True
+
+    def defer(self, state: Dict[str, Any]):
+        """
+        Hold a state describing a row that is only buffered on the batch
+        writer; save_deferred() writes it once the batch is flushed.
+        """
+        with self._lock:
+            self._deferred[state['account_id']] = state
+
+    def save_deferred(self, skip=()):
+        """Write the held states in bulk, except for accounts in `skip` (rows that failed to write)."""
+        with self._lock:
+            states = [state for account_id, state in self._deferred.items() if account_id not in skip]
+            self._deferred = {}
+        if states and not self.store.db.save_items(states):
+            logger.error(f"Failed to save some of {len(states)} sync states")
@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+
+# Tests import the API modules the way the app does, from api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """In-memory DynamoDB (moto); every test starts without tables."""
+    from moto import mock_aws
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("DYNAMODB_ENDPOINT_URL", raising=False)
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+def api(aws):
+    """The FastAPI app with its tables created by the lifespan."""
+    from fastapi.testclient import TestClient
+    import index
+    with TestClient(index.app) as client:
+        yield client
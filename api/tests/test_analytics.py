@@ -0,0 +1,53 @@
+import numpy as np
+import analytics
+
+
+def values(array):
+    return analytics._to_list(array)
+
+
+def test_daily_series_takes_each_days_last_value():
+    rows = [
+        {'timestamp': '2026-01-01T20:00:00', 'followers_total': 110},
+        {'timestamp': '2026-01-01T08:00:00', 'followers_total': 100},
+        {'timestamp': '2026-01-02T23:59:59', 'followers_total': 130},
+        {'timestamp': '2026-01-02T09:00:00.123456', 'followers_total': 120},
+    ]
+    days, series = analytics.daily_series(rows, ['followers_total'])
+
+    assert [str(day) for day in days] == ['2026-01-01', '2026-01-02']
+    assert values(series['followers_total']) == [110, 130]
+
+
+def test_daily_series_fills_gap_days_with_nan():
+    rows = [
+        {'timestamp': '2026-01-01T08:00:00', 'interactions': 1},
+        {'timestamp': '2026-01-04T08:00:00', 'interactions': 4},
+    ]
+    days, series = analytics.daily_series(rows, ['interactions'])
+
+    assert len(days) == 4
+    assert values(series['interactions']) == [1, None, None, 4]
+
+
+def test_daily_series_is_per_field():
+    # The day's latest row lacks views_organic; the earlier value still counts
+    rows = [
+        {'timestamp': '2026-01-01T08:00:00', 'followers_total': 100, 'views_organic': 7},
+        {'timestamp': '2026-01-01T20:00:00', 'followers_total': 101},
+        {'timestamp': '2026-01-02T20:00:00', 'followers_total': 102, 'views_organic': None},
+    ]
+    _, series = analytics.daily_series(rows, ['followers_total', 'views_organic'])
+
+    assert values(series['followers_total']) == [101, 102]
+    assert values(series['views_organic']) == [7, None]
+
+
+def test_daily_series_without_rows():
+    days, series = analytics.daily_series([{'timestamp': None}], ['followers_total'])
+    assert len(days) == 0
+    assert len(series['followers_total']) == 0
+
+
+def test_delta_is_day_over_day():
+    assert values(analytics.delta(np.array([100.0, 110.0, np.nan, 130.0]))) == [None, 10, None, None]
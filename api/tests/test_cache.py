@@ -0,0 +1,86 @@
+import time
+import pytest
+from Db.database import DynamoDB
+from Db.cache import CachedDynamoDB
+
+
+@pytest.fixture
+def tables(aws):
+    backend = DynamoDB('socials_integrations')
+    backend.create_table(pk='platform', sk='account_id')
+    backend.save_item({'platform': 'instagram', 'account_id': 'abc', 'name': 'first'})
+    return backend
+
+
+def test_hits_until_the_ttl_expires(tables):
+    cached = CachedDynamoDB('socials_integrations', ttl=0.1)
+    key = {'platform': 'instagram', 'account_id': 'abc'}
+    assert cached.get_item(key)['name'] == 'first'
+
+    # Written by another process: this one keeps serving its copy until the TTL
+    tables.save_item(dict(key, name='second'))
+    assert cached.get_item(key)['name'] == 'first'
+    assert (cached.hits, cached.misses) == (1, 1)
+
+    time.sleep(0.15)
+    assert cached.get_item(key)['name'] == 'second'
+    assert cached.misses == 2
+
+
+def test_own_writes_invalidate(tables):
+    cached = CachedDynamoDB('socials_integrations', ttl=60)
+    key = {'platform': 'instagram', 'account_id': 'abc'}
+    assert len(cached.scan_items()) == 1
+
+    cached.save_item({'platform': 'youtube', 'account_id': 'UCx'})
+    assert len(cached.scan_items()) == 2
+    cached.update_item(key, 'SET #n = :n', {':n': 'renamed'}, {'#n': 'name'})
+    assert cached.get_item(key)['name'] == 'renamed'
+    with cached.batch_writer() as writer:
+        writer.delete(key)
+    assert cached.get_item(key) is None
+    assert cached.invalidations == 3
+
+
+def test_load_racing_a_write_is_not_cached(tables, monkeypatch):
+    cached = CachedDynamoDB('socials_integrations', ttl=60)
+    key = {'platform': 'instagram', 'account_id': 'abc'}
+    load = DynamoDB.get_item
+
+    def load_then_write(self, item_key):
+        value = load(self, item_key)
+        # Lands after the read but before the value is cached
+        self.invalidate()
+        return value
+
+    monkeypatch.setattr(DynamoDB, 'get_item', load_then_write)
+    cached.get_item(key)
+    assert cached.stats()['size'] == 0
+
+    monkeypatch.setattr(DynamoDB, 'get_item', load)
+    cached.get_item(key)
+    assert cached.stats()['size'] == 1
+
+
+def test_callers_get_copies(tables):
+    cached = CachedDynamoDB('socials_integrations', ttl=60)
+    key = {'platform': 'instagram', 'account_id': 'abc'}
+    cached.get_item(key)['name'] = 'mutated'
+    assert cached.get_item(key)['name'] == 'first'
+
+
+def test_least_recently_used_entries_are_evicted(tables):
+    cached = CachedDynamoDB('socials_integrations', ttl=60, max_entries=2)
+    for account_id in ('a', 'b', 'c'):
+        tables.save_item({'platform': 'instagram', 'account_id': account_id})
+    cached.get_item({'platform': 'instagram', 'account_id': 'a'})
+    cached.get_item({'platform': 'instagram', 'account_id': 'b'})
+    cached.get_item({'platform': 'instagram', 'account_id': 'a'})
+    cached.get_item({'platform': 'instagram', 'account_id': 'c'})
+    assert cached.evictions == 1
+
+    # 'b' was the least recently used
+    cached.get_item({'platform': 'instagram', 'account_id': 'a'})
+    assert cached.hits == 2
+    cached.get_item({'platform': 'instagram', 'account_id': 'b'})
+    assert cached.misses == 4
@@ -0,0 +1,99 @@
+import pytest
+from sync_state import SyncRun
+
+
+@pytest.fixture
+def index(api, monkeypatch):
+    import index
+    monkeypatch.setattr(index, 'DELTA_SYNC', True)
+    return index
+
+
+def snapshot(timestamp, followers, interactions=5):
+    return {'account_id': 'instagram#abc', 'timestamp': timestamp, 'platform': 'instagram',
+            'followers_total': followers, 'followers_new': 0, 'interactions': interactions}
+
+
+def stored_rows(index):
+    return index.metrics_db.query_items('account_id = :acc', {':acc': 'instagram#abc'})
+
+
+def test_identical_snapshot_is_not_written_again(index):
+    state = index.sync_state.get('instagram#abc')
+    index.store_synced_item(snapshot('2026-01-05T08:00:00', 100), state=state)
+
+    state = index.sync_state.get('instagram#abc')
+    assert state['values']['followers_total'] == 100
+    item = index.store_synced_item(snapshot('2026-01-05T09:00:00', 100), state=state)
+
+    assert item['unchanged'] is True
+    assert [row['timestamp'] for row in stored_rows(index)] == ['2026-01-05T08:00:00']
+    assert index.latest_metrics.get('instagram#abc')['timestamp'] == '2026-01-05T08:00:00'
+
+
+def test_changed_snapshot_is_written(index):
+    index.store_synced_item(snapshot('2026-01-05T08:00:00', 100))
+    item = index.store_synced_item(snapshot('2026-01-05T09:00:00', 100, interactions=6),
+                                   state=index.sync_state.get('instagram#abc'))
+
+    assert 'unchanged' not in item
+    assert len(stored_rows(index)) == 2
+    assert index.sync_state.get('instagram#abc')['updated_at'] == '2026-01-05T09:00:00'
+
+
+def test_fresh_insights_are_remembered_for_unchanged_snapshots(index):
+    index.store_synced_item(snapshot('2026-01-05T08:00:00', 100))
+    insights = {'values': {'views_organic': 7}, 'valid_until': '2026-01-06T08:00:00'}
+    index.store_synced_item(snapshot('2026-01-05T09:00:00', 100),
+                            state=index.sync_state.get('instagram#abc'), fresh_insights=insights)
+
+    state = index.sync_state.get('instagram#abc')
+    assert state['insights'] == {'views_organic': 7}
+    assert state['insights_valid_until'] == '2026-01-06T08:00:00'
+    assert len(stored_rows(index)) == 1
+
+
+def test_followers_new_from_the_previous_day(index):
+    index.store_synced_item(snapshot('2026-01-04T20:00:00', 100))
+    item = index.store_synced_item(snapshot('2026-01-05T08:00:00', 112),
+                                   state=index.sync_state.get('instagram#abc'))
+    assert item['followers_new'] == 12
+
+    # Later the same day the delta is still against the previous day's last snapshot
+    item = index.store_synced_item(snapshot('2026-01-05T20:00:00', 115),
+                                   state=index.sync_state.get('instagram#abc'))
+    assert item['followers_new'] == 15
+    assert index.sync_state.get('instagram#abc')['baseline']['day'] == '2026-01-04'
+
+
+def test_buffered_rows_save_their_state_after_the_flush(index):
+    run = SyncRun(index.sync_state, ['instagram#abc', 'instagram#other'])
+    with index.metrics_db.batch_writer() as writer:
+        index.store_synced_item(snapshot('2026-01-05T08:00:00', 100), writer, run.get('instagram#abc'), run=run)
+        assert index.sync_state.get('instagram#abc') is None
+    run.save_deferred()
+
+    assert index.sync_state.get('instagram#abc')['values']['followers_total'] == 100
+
+
+def test_failed_rows_keep_their_old_state(index):
+    run = SyncRun(index.sync_state, ['instagram#abc'])
+    with index.metrics_db.batch_writer() as writer:
+        index.store_synced_item(snapshot('2026-01-05T08:00:00', 100), writer, run.get('instagram#abc'), run=run)
+    run.save_deferred(skip={'instagram#abc'})
+
+    assert index.sync_state.get('instagram#abc') is None
+
+
+def test_overlapping_runs_keep_their_own_state(index):
+    first = SyncRun(index.sync_state, ['instagram#abc'])
+    second = SyncRun(index.sync_state, ['instagram#abc'])
+    with index.metrics_db.batch_writer() as writer:
+        index.store_synced_item(snapshot('2026-01-05T08:00:00', 100), writer, first.get('instagram#abc'), run=first)
+
+    second.save_deferred()
+    assert index.sync_state.get('instagram#abc') is None
+    assert second.get('instagram#abc') is None
+
+    first.save_deferred()
+    assert index.sync_state.get('instagram#abc')['values']['followers_total'] == 100
@@ -0,0 +1,70 @@
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from http_caching import CompressionMiddleware, make_etag, etag_matches
+
+
+def small_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big(response: Response):
+        response.headers["ETag"] = '"abc"'
+        return {"rows": ["x" * 10] * 50}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_etag_matching():
+    etag = make_etag("instagram#abc", "2026-01-05T08:00:00", "")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'W/{etag[:-1]}-gzip"', etag)
+    assert etag_matches(f'"other", {etag[:-1]}-br"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_compresses_large_json_and_tags_the_etag():
+    response = small_app().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == {"rows": ["x" * 10] * 50}
+    assert int(response.headers["content-length"]) < len(response.content)
+
+
+def test_small_or_unnegotiated_responses_pass_through():
+    client = small_app()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_metrics_endpoint_answers_304_for_the_compressed_etag(api):
+    import index
+    for hour in range(24):
+        index.save_metric_item({'account_id': 'instagram#abc', 'timestamp': f'2026-01-05T{hour:02d}:00:00',
+                                'platform': 'instagram', 'followers_total': 100 + hour, 'interactions': hour})
+
+    first = api.get('/metrics/instagram/abc', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200
+    assert first.headers['content-encoding'] == 'gzip'
+    etag = first.headers['etag']
+    assert etag.endswith('-gzip"')
+
+    again = api.get('/metrics/instagram/abc', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.content == b''
+
+    # A new snapshot changes the account's version, so the old ETag no longer matches
+    index.save_metric_item({'account_id': 'instagram#abc', 'timestamp': '2026-01-06T00:00:00',
+                            'platform': 'instagram', 'followers_total': 130, 'interactions': 1})
+    changed = api.get('/metrics/instagram/abc', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert len(changed.json()) == 25
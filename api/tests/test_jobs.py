@@ -0,0 +1,80 @@
+import types
+import pytest
+import jobs
+from Db.database import DynamoDB
+from jobs import JobQueue
+
+
+class Clock:
+    def __init__(self, now=1_000_000):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(jobs, 'time', types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def queue(aws, clock):
+    queue = JobQueue(DynamoDB('sync_jobs'))
+    queue.create_table()
+    return queue
+
+
+def test_claims_the_oldest_queued_job_once(queue):
+    first = queue.enqueue('full_sync')
+    second = queue.enqueue('account_sync', {'platform': 'instagram', 'account_id': 'abc'})
+
+    job = queue.claim_next('worker-a', lease_seconds=60)
+    assert job['id'] == first
+    assert job['status'] == 'running' and job['worker_id'] == 'worker-a'
+    assert queue.claim(first, 'worker-b') is None
+
+    assert queue.claim_next('worker-b')['id'] == second
+    assert queue.claim_next('worker-c') is None
+
+
+def test_expired_lease_is_claimed_again(queue, clock):
+    job_id = queue.enqueue('full_sync')
+    queue.claim_next('worker-a', lease_seconds=60)
+
+    clock.now += 59
+    assert queue.claim_next('worker-b') is None
+    clock.now += 2
+    job = queue.claim_next('worker-b', lease_seconds=60)
+    assert job['id'] == job_id and job['worker_id'] == 'worker-b'
+
+
+def test_progress_renews_the_lease(queue, clock):
+    job_id = queue.enqueue('full_sync')
+    queue.claim_next('worker-a', lease_seconds=60)
+
+    clock.now += 50
+    queue.record_progress(job_id, ok=True)
+    queue.record_progress(job_id, ok=False)
+    job = queue.get(job_id)
+    assert job['lease_until'] == clock.now + 60
+    assert (job['completed'], job['failed']) == (1, 1)
+
+    clock.now += 50
+    assert queue.claim_next('worker-b') is None
+
+
+def test_finished_jobs_are_not_claimed(queue, clock):
+    done = queue.enqueue('full_sync')
+    failed = queue.enqueue('backfill')
+    queue.claim(done, 'worker-a', lease_seconds=60)
+    queue.claim(failed, 'worker-a', lease_seconds=60)
+    queue.complete(done, {'total': 1})
+    queue.fail(failed, 'boom')
+
+    clock.now += 3600
+    assert queue.claim_next('worker-b') is None
+    assert queue.get(done)['result'] == {'total': 1}
+    assert queue.get(failed)['error'] == 'boom'
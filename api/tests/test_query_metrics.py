@@ -0,0 +1,60 @@
+import pytest
+from fastapi import HTTPException
+
+
+@pytest.fixture
+def history(api):
+    import index
+    index.metrics_db.save_items([
+        {'account_id': 'instagram#abc', 'timestamp': f'2026-01-0{day}T12:00:00', 'platform': 'instagram',
+         'followers_total': 100 + day, 'interactions': day}
+        for day in range(1, 6)
+    ])
+    return index
+
+
+def test_newest_first_without_limit(history):
+    items, cursor = history.query_metrics('instagram', 'ABC')
+    assert [item['timestamp'][:10] for item in items] == [f'2026-01-0{day}' for day in range(5, 0, -1)]
+    assert cursor is None
+
+
+def test_bare_to_date_includes_the_whole_day(history):
+    items, _ = history.query_metrics('instagram', 'abc', start='2026-01-02', end='2026-01-04')
+    assert [item['timestamp'][:10] for item in items] == ['2026-01-04', '2026-01-03', '2026-01-02']
+
+
+def test_cursor_pages_through_the_window(history):
+    pages = []
+    cursor = None
+    while True:
+        items, cursor = history.query_metrics('instagram', 'abc', start='2026-01-02', limit=2, cursor=cursor)
+        pages.append([item['timestamp'][:10] for item in items])
+        if cursor is None:
+            break
+    # A full last page still carries a cursor; the page after it is empty
+    assert pages == [['2026-01-05', '2026-01-04'], ['2026-01-03', '2026-01-02'], []]
+
+
+def test_fields_limit_the_attributes(history):
+    items, _ = history.query_metrics('instagram', 'abc', limit=1, fields='followers_total')
+    assert items == [{'timestamp': '2026-01-05T12:00:00', 'followers_total': 105}]
+
+
+def test_invalid_cursor_is_rejected(history):
+    with pytest.raises(HTTPException) as error:
+        history.query_metrics('instagram', 'abc', limit=2, cursor='not-a-cursor')
+    assert error.value.status_code == 400
+
+
+def test_endpoint_returns_next_cursor_header(history, api):
+    first = api.get('/metrics/instagram/abc', params={'limit': 3})
+    assert [item['timestamp'][:10] for item in first.json()] == ['2026-01-05', '2026-01-04', '2026-01-03']
+    second = api.get('/metrics/instagram/abc', params={'limit': 3, 'cursor': first.headers['X-Next-Cursor']})
+    assert [item['timestamp'][:10] for item in second.json()] == ['2026-01-02', '2026-01-01']
+
+
+def test_legacy_partition_fallback(history):
+    history.metrics_db.save_item({'account_id': 'old', 'timestamp': '2025-01-01T00:00:00', 'followers_total': 1})
+    items, _ = history.query_metrics('instagram', 'old')
+    assert [item['account_id'] for item in items] == ['old']
@@ -0,0 +1,97 @@
+import time
+import httpx
+import pytest
+from Sources import ratelimit, resilience, transport
+from Sources.resilience import CircuitBreaker, CircuitOpenError
+
+
+def open_breaker(reset_seconds=0.05):
+    breaker = CircuitBreaker("api.test", threshold=2, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold_failures():
+    breaker = open_breaker(reset_seconds=60)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    trial_id = breaker.before_call()
+    assert trial_id is not None
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is None
+
+
+def test_failed_trial_opens_again():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.trial_in_flight
+
+
+def test_trial_without_outcome_releases_its_slot():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        with breaker.attempt():
+            raise RuntimeError("cancelled")
+    assert breaker.state == "half_open"
+    assert breaker.before_call() is not None
+
+
+def test_release_leaves_a_later_trial_alone():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    first = breaker.before_call()
+    breaker.record_failure()
+    time.sleep(0.06)
+    second = breaker.before_call()
+    breaker.release_trial(first)
+    assert breaker.trial_in_flight
+    breaker.release_trial(second)
+    assert not breaker.trial_in_flight
+
+
+def test_check_does_not_take_the_trial():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.check()
+    breaker.check()
+    assert not breaker.trial_in_flight
+
+
+def test_throttled_trial_does_not_wedge_the_breaker(monkeypatch):
+    url = "https://graph.facebook.com/v19.0/me"
+    host = httpx.URL(url).netloc.decode()
+    breaker = CircuitBreaker(host, threshold=1, reset_seconds=0.05)
+    monkeypatch.setitem(resilience._breakers, host, breaker)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    def exhausted(*args, **kwargs):
+        raise ratelimit.RateLimitExceeded("graph", 60)
+
+    monkeypatch.setattr(transport, "_rate_limited", lambda *args: ("graph", "token"))
+    monkeypatch.setattr(transport, "_throttle_wait", exhausted)
+    with pytest.raises(ratelimit.RateLimitExceeded):
+        transport.get(url)
+    assert breaker.state == "half_open"
+    assert not breaker.trial_in_flight
+
+    monkeypatch.setattr(transport, "_throttle_wait", lambda *args: 0.0)
+    monkeypatch.setattr(transport, "get_client", lambda: httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={}))))
+    assert transport.get(url).status_code == 200
+    assert breaker.state == "closed"
@@ -0,0 +1,86 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from Db.database import DynamoDB
+from rollups import RollupStore, bucket_for
+
+
+@pytest.fixture
+def rollups(aws):
+    store = RollupStore(DynamoDB('metric_rollups'))
+    store.create_table()
+    return store
+
+
+def snapshot(timestamp, followers, **fields):
+    return {'account_id': 'instagram#abc', 'platform': 'instagram', 'timestamp': timestamp,
+            'followers_total': followers, **fields}
+
+
+def test_bucket_keys():
+    assert bucket_for('2024-01-07T10:00:00', 'daily') == '2024-01-07'
+    assert bucket_for('2024-01-07T10:00:00', 'weekly') == '2024-W01'
+    assert bucket_for('2024-01-07T10:00:00', 'monthly') == '2024-01'
+
+
+def test_merges_snapshots_into_every_granularity(rollups):
+    # Out of order on purpose: first/last follow the timestamps
+    rollups.record_many([
+        snapshot('2026-01-05T18:00:00', 120),
+        snapshot('2026-01-05T08:00:00', 100),
+        snapshot('2026-01-06T08:00:00', 90),
+    ])
+
+    day = rollups.query('instagram#abc', 'daily', '2026-01-05', '2026-01-05')[0]
+    assert day['count'] == 2 and day['snapshots'] == 2 and day['version'] == 1
+    assert day['metrics']['followers_total'] == {'first': 100, 'last': 120, 'max': 120, 'sum': 220, 'delta': 20}
+
+    month = rollups.query('instagram#abc', 'monthly')[0]
+    assert month['count'] == 3
+    assert month['metrics']['followers_total'] == {'first': 100, 'last': 90, 'max': 120, 'sum': 310, 'delta': -10}
+
+
+def test_backfilled_rows_do_not_move_first_and_last(rollups):
+    rollups.record(snapshot('2026-01-05T12:00:00', 0, interactions=5))
+    rollups.record({'account_id': 'instagram#abc', 'platform': 'instagram', 'timestamp': '2026-01-05T23:59:59',
+                    'source': 'backfill', 'interactions': 7})
+
+    day = rollups.query('instagram#abc', 'daily')[0]
+    assert day['count'] == 2 and day['snapshots'] == 1
+    assert day['metrics']['interactions'] == {'first': 5, 'last': 5, 'max': 7, 'sum': 12, 'delta': 0}
+    assert day['last_timestamp'] == '2026-01-05T12:00:00'
+
+
+def test_write_conditional_on_the_version_read(rollups):
+    rollups.record(snapshot('2026-01-05T08:00:00', 100))
+    stale = rollups.db.get_item({'series': 'instagram#abc#daily', 'bucket': '2026-01-05'})
+    rollups.record(snapshot('2026-01-05T09:00:00', 110))
+
+    group = {'granularity': 'daily', 'items': [snapshot('2026-01-05T10:00:00', 120)]}
+    assert not rollups._put_merged('instagram#abc#daily', '2026-01-05', stale, group)
+    assert not rollups._put_merged('instagram#abc#daily', '2026-01-05', None, group)
+
+
+def test_retries_after_a_concurrent_write(rollups, monkeypatch):
+    rollups.record(snapshot('2026-01-05T08:00:00', 100))
+    stale = rollups.db.batch_get_items([{'series': 'instagram#abc#daily', 'bucket': '2026-01-05'}])
+    rollups.record(snapshot('2026-01-05T09:00:00', 110))
+
+    # The next record_many reads the bucket as it was before the second write
+    monkeypatch.setattr(rollups.db, 'batch_get_items', lambda keys: stale)
+    rollups.record(snapshot('2026-01-05T10:00:00', 120))
+
+    day = rollups.db.get_item({'series': 'instagram#abc#daily', 'bucket': '2026-01-05'})
+    assert day['count'] == 3 and day['version'] == 3
+    assert day['metrics']['followers_total']['sum'] == 330
+
+
+def test_concurrent_writers_lose_no_snapshot(rollups):
+    def write(second):
+        rollups.record(snapshot(f'2026-01-05T08:00:{second:02d}', second))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(24)))
+
+    day = rollups.query('instagram#abc', 'daily')[0]
+    assert day['count'] == 24 and day['version'] == 24
+    assert day['metrics']['followers_total']['last'] == 23
@@ -0,0 +1,87 @@
+import time
+import threading
+from sync_executor import SyncExecutor, parse_platform_limits
+
+
+def accounts(*platforms):
+    return [{"platform": platform, "account_id": f"{platform}-{i}", "access_token": "t"}
+            for i, platform in enumerate(platforms)]
+
+
+def test_platform_limits_cap_concurrency():
+    lock = threading.Lock()
+    running = {"instagram": 0, "youtube": 0}
+    peak = {"instagram": 0, "youtube": 0}
+
+    def handler(platform):
+        def run(account_id, token):
+            with lock:
+                running[platform] += 1
+                peak[platform] = max(peak[platform], running[platform])
+            time.sleep(0.02)
+            with lock:
+                running[platform] -= 1
+            return {"account_id": account_id}
+        return run
+
+    executor = SyncExecutor({"instagram": handler("instagram"), "youtube": handler("youtube")},
+                            max_workers=8, platform_limits={"instagram": 1, "youtube": 2})
+    summary = executor.run(accounts(*["instagram"] * 4, *["youtube"] * 4))
+
+    assert summary["succeeded"] == 8
+    assert peak == {"instagram": 1, "youtube": 2}
+
+
+def test_capped_platform_does_not_hold_up_others():
+    released = threading.Event()
+
+    def instagram(account_id, token):
+        # Only finishes once the YouTube account behind it has run
+        assert released.wait(2)
+        return {"account_id": account_id}
+
+    def youtube(account_id, token):
+        released.set()
+        return {"account_id": account_id}
+
+    executor = SyncExecutor({"instagram": instagram, "youtube": youtube},
+                            max_workers=2, platform_limits={"instagram": 1, "youtube": 1})
+    summary = executor.run(accounts("instagram", "instagram", "instagram", "youtube"))
+
+    assert summary["succeeded"] == 4
+
+
+def test_results_keep_account_order():
+    def handler(account_id, token):
+        return None if account_id.endswith("1") else {"account_id": account_id}
+
+    summary = SyncExecutor({"instagram": handler, "facebook": handler}, max_workers=3).run(
+        accounts("instagram", "meta", "tiktok", "instagram"))
+
+    assert [r["account_id"] for r in summary["results"]] == ["instagram-0", "meta-1", "tiktok-2", "instagram-3"]
+    assert [r["status"] for r in summary["results"]] == ["ok", "failed", "skipped", "ok"]
+    assert summary["results"][1]["platform"] == "facebook"
+
+
+def test_accounts_not_started_by_the_deadline_are_skipped():
+    calls = []
+
+    def handler(account_id, token):
+        calls.append(account_id)
+        time.sleep(0.1)
+        return {"account_id": account_id}
+
+    executor = SyncExecutor({"instagram": handler}, max_workers=1,
+                            deadline=time.monotonic() + 0.05)
+    summary = executor.run(accounts("instagram", "instagram", "instagram"))
+
+    assert calls == ["instagram-0"]
+    assert [r["status"] for r in summary["results"]] == ["ok", "skipped", "skipped"]
+    assert summary["skipped"] == 2
+
+
+def test_parse_platform_limits():
+    limits = parse_platform_limits("instagram=1, youtube=x,broken,Pinterest=0")
+    assert limits["instagram"] == 1
+    assert limits["youtube"] == 2
+    assert limits["pinterest"] == 1
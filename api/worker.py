@@ -0,0 +1,39 @@
+"""
+Local worker for queued sync jobs (run the API with SYNC_MODE=queue).
+
+    python worker.py          # poll forever
+    python worker.py --once   # drain the queue and exit
+"""
+import os
+import time
+import socket
+import logging
+import argparse
+from index import job_queue, execute_job
+from jobs import DEFAULT_LEASE_SECONDS
+
+logger = logging.getLogger("social_insights.worker")
+
+
+def run(once: bool = False, poll_interval: float = 2.0):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    lease_seconds = int(os.getenv("SYNC_JOB_LEASE_SECONDS", DEFAULT_LEASE_SECONDS))
+    logger.info(f"Worker {worker_id} started")
+    while True:
+        job = job_queue.claim_next(worker_id, lease_seconds)
+        if not job:
+            if once:
+                logger.info("Queue is empty, exiting.")
+                return
+            time.sleep(poll_interval)
+            continue
+        logger.info(f"Running {job['type']} job {job['id']}")
+        execute_job(job)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued sync jobs")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+    run(args.once, args.poll_interval)
@@ -122,12 +122,12 @@ export default function DashPage() {
 
     const loadDashboardData = async () => {
         setIsLoading(true);
-        let integrations: any[] = [];
         try {
-            // 1. Fetch connected integrations (accounts)
-            const integrationsRes = await fetch(`${API_URL}/integrations`);
-            if (integrationsRes.ok) {
-                integrations = await integrationsRes.json();
+            // 1. Fetch every connected account with its newest snapshot in one request
+            let accounts: any[] = [];
+            const latestRes = await fetch(`${API_URL}/metrics/latest`);
+            if (latestRes.ok) {
+                accounts = await latestRes.json();
             }
 
             // 2. Fetch sync status
@@ -137,50 +137,22 @@ export default function DashPage() {
                 setSyncStatus(statusData);
             }
 
-            // 3. Fetch metrics for each account
-            if (Array.isArray(integrations) && integrations.length > 0) {
-                const promises = integrations.map(async (acc: any) => {
-                    const account_id = acc.account_id;
-                    let m = {
+            if (Array.isArray(accounts) && accounts.length > 0) {
+                const results = accounts.map((acc: any) => {
+                    const latest = acc.latest || {};
+                    return {
                         accountName: acc.account_name || acc.account_id,
-                        followersTotal: 0,
-                        followersNew: 0,
-                        viewsOrganic: 0,
-                        viewsAds: 0,
-                        interactions: 0,
-                        profileVisits: 0,
-                        accountsReached: 0,
-                        saves: 0,
+                        followersTotal: parseInt(latest.followers_total) || 0,
+                        followersNew: parseInt(latest.followers_new) || 0,
+                        viewsOrganic: parseInt(latest.views_organic) || 0,
+                        viewsAds: parseInt(latest.views_ads) || 0,
+                        interactions: parseInt(latest.interactions) || 0,
+                        profileVisits: parseInt(latest.profile_visits) || 0,
+                        accountsReached: parseInt(latest.accounts_reached) || 0,
+                        saves: parseInt(latest.saves) || 0,
                         platform: acc.platform
                     };
-
-                    try {
-                        const mRes = await fetch(`${API_URL}/metrics/${acc.platform}/${account_id}`);
-                        if (mRes.ok) {
-                            const mData = await mRes.json();
-                            if (Array.isArray(mData) && mData.length > 0) {
-                                const latest = mData[0];
-                                m = {
-                                    accountName: acc.account_name || acc.account_id,
-                                    followersTotal: parseInt(latest.followers_total) || 0,
-                                    followersNew: parseInt(latest.followers_new) || 0,
-                                    viewsOrganic: parseInt(latest.views_organic) || 0,
-                                    viewsAds: parseInt(latest.views_ads) || 0,
-                                    interactions: parseInt(latest.interactions) || 0,
-                                    profileVisits: parseInt(latest.profile_visits) || 0,
-                                    accountsReached: parseInt(latest.accounts_reached) || 0,
-                                    saves: parseInt(latest.saves) || 0,
-                                    platform: acc.platform
-                                };
-                            }
-                        }
-                    } catch (err) {
-                        console.warn(`Failed fetching metrics for ${account_id}`, err);
-                    }
-                    return m;
                 });
-
-                const results = await Promise.all(promises);
                 setMetrics(results);
             } else {
                 setMetrics([]);